@@ -1,14 +1,34 @@
 import os
-import arcpy
+import sys
+import atexit
+import contextlib
+import cProfile
+import json
+import hashlib
+import shutil
+import sqlite3
+import threading
+import time
 import smartsheet
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
 import concurrent.futures
+import functools
 import re
-from openpyxl import Workbook, load_workbook
+from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 
+try:
+    import arcpy
+except ImportError:
+    # Only the 'rest' write backend runs without arcpy; attachment uploads are then left pending.
+    arcpy = None
+
+# The batched applyEdits writer is shared with the other project scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared'))
+from apply_edits_writer import ApplyEditsWriter
+
 # Initialize the Smartsheet client using the API token.
 # Replace the placeholder with your actual API token.
 API_TOKEN = 'REPLACE_WITH_SMARTSHEET_API_TOKEN'
@@ -26,6 +46,99 @@ field_mapping = {
     # Add the rest of the field mappings here as needed.
 }
 
+# Limits for a single "IN (...)" where clause sent to the feature service.
+max_in_clause_values = 500
+max_where_clause_length = 8000
+
+# Incremental sync settings. Only rows modified since the last successful run are pushed
+# unless force_full_resync is set. The sync state is stored next to the downloads. The local
+# clock is only trusted to within sync_overlap, so rows modified that close to the start of a
+# run are fetched again on the next one.
+incremental_sync = True
+force_full_resync = False
+sync_overlap = timedelta(minutes=5)
+sync_state_file = os.path.join(download_folder, 'smartsheet_sync_state.json')
+
+# Number of rows requested from Smartsheet per page when streaming the sheet.
+sheet_page_size = 500
+
+# Set to True to print the planned feature service edits and attachment uploads without
+# applying them. Attachments are listed but not downloaded, and the ledger is only read.
+dry_run = False
+
+# How feature edits are written: 'cursor' uses arcpy cursors one row at a time, 'rest' sends
+# batched applyEdits requests. Set the token if the service needs one for REST access.
+write_backend = 'cursor'
+feature_service_token = None
+apply_edits_batch_size = 250
+apply_edits_workers = 4
+
+# Run report and profiling settings. A JSON report with per-phase timings and counters is
+# written at the end of every run. Set profile_phase to a phase name (e.g. 'feature_update')
+# to run cProfile on that phase only; the stats are saved next to the report.
+run_report_file = os.path.join(download_folder, 'run_report.json')
+profile_phase = None
+
+# Timings for nested phases of the run, keyed by phase name. Repeated phases (such as one
+# per sheet page) are added together, so the report shows total time and call count.
+run_report = {'started_at': datetime.now().isoformat(), 'phases': {}, 'counters': {}}
+run_start = time.monotonic()
+phase_stack = []
+metrics_lock = threading.Lock()
+phase_profiler = cProfile.Profile()
+
+# Helper function to add to a run counter (rows, bytes, API calls) from any thread.
+def count_metric(name, amount=1):
+    """Add to a named counter in the run report."""
+    with metrics_lock:
+        run_report['counters'][name] = run_report['counters'].get(name, 0) + amount
+
+# Context manager that times a phase of the run and nests it under the current phase.
+@contextlib.contextmanager
+def timed_phase(name):
+    """Time the enclosed block, optionally under cProfile, and add it to the run report."""
+    siblings = phase_stack[-1]['phases'] if phase_stack else run_report['phases']
+    phase = siblings.setdefault(name, {'seconds': 0.0, 'calls': 0, 'phases': {}})
+    phase_stack.append(phase)
+    profiler = phase_profiler if name == profile_phase else None
+    if profiler:
+        profiler.enable()
+    start = time.monotonic()
+    try:
+        yield phase
+    finally:
+        phase['seconds'] += time.monotonic() - start
+        phase['calls'] += 1
+        phase_stack.pop()
+        if profiler:
+            # Stats accumulate across every call of the profiled phase.
+            profiler.disable()
+            profile_file = os.path.join(download_folder, f'profile_{name}.prof')
+            profiler.dump_stats(profile_file)
+            phase['profile'] = profile_file
+
+# Write the run report; registered with atexit so a failed run still leaves a report.
+def write_run_report():
+    """Save the phase timings and counters as JSON."""
+    def to_list(phases):
+        return [{'name': name, 'seconds': round(phase['seconds'], 3), 'calls': phase['calls'],
+                 **({'profile': phase['profile']} if 'profile' in phase else {}),
+                 'phases': to_list(phase['phases'])}
+                for name, phase in phases.items()]
+
+    report = {
+        'started_at': run_report['started_at'],
+        'finished_at': datetime.now().isoformat(),
+        'total_seconds': round(time.monotonic() - run_start, 3),
+        'phases': to_list(run_report['phases']),
+        'counters': dict(run_report['counters'])
+    }
+    with open(run_report_file, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"Run report written to {run_report_file}")
+
+atexit.register(write_run_report)
+
 # Helper function to format numeric values as strings.
 def format_value(value):
     """Ensure numeric values are returned as formatted strings to prevent issues."""
@@ -33,182 +146,879 @@ def format_value(value):
         return "{:.10f}".format(value).rstrip('0').rstrip('.')
     return str(value)
 
+# Helper function to look up a timezone once instead of on every cell.
+@functools.lru_cache(maxsize=None)
+def get_timezone(timezone_str):
+    """Return the cached pytz timezone for a name."""
+    return pytz.timezone(timezone_str)
+
 # Helper function to handle date conversion to a readable format in a specific timezone.
 def format_date(date_str, timezone_str='America/Los_Angeles'):
     """Convert an ISO 8601 date string to a readable local time format."""
     try:
         date_obj = datetime.strptime(date_str[:-1], "%Y-%m-%dT%H:%M:%S")
         date_obj = pytz.utc.localize(date_obj)
-        local_tz = pytz.timezone(timezone_str)
+        local_tz = get_timezone(timezone_str)
         local_date = date_obj.astimezone(local_tz)
         return local_date.strftime("%m/%d/%y %I:%M %p")
     except ValueError:
         # If the input isn't a valid ISO 8601 string, just return it as-is.
         return date_str
 
+# Smartsheet column types whose values arrive as ISO 8601 UTC timestamps.
+datetime_column_types = {'DATETIME', 'ABSTRACT_DATETIME'}
+datetime_system_column_types = {'CREATED_DATE', 'MODIFIED_DATE'}
+
+# Helper function to convert a Smartsheet timestamp cell, leaving other values as strings.
+def convert_datetime_cell(value):
+    """Format timestamp strings in local time and return any other value as a string."""
+    return format_date(value) if isinstance(value, str) else str(value)
+
+# Work out the converter for each mapped column once from the Smartsheet column types.
+def build_column_converters(columns):
+    """Map column ID to (feature service field, converter) for every mapped column."""
+    converters = {}
+    for col in columns:
+        if col.title not in field_mapping:
+            continue
+        # The SDK returns column types as unhashable enum wrappers, so compare their names.
+        if str(col.type) in datetime_column_types \
+                or str(getattr(col, 'system_column_type', None)) in datetime_system_column_types:
+            converters[col.id] = (field_mapping[col.title], convert_datetime_cell)
+        else:
+            converters[col.id] = (field_mapping[col.title], str)
+    return converters
+
+# Convert Smartsheet rows column by column into feature service records.
+def transform_rows(rows, converters):
+    """Return {row_id: record} with each column converted in one batch and repeated values converted once."""
+    row_ids = [format_value(row.id) for row in rows]
+    records = [{row_id_field: row_id} for row_id in row_ids]
+
+    # Gather the cells of each mapped column together.
+    column_cells = {column_id: ([], []) for column_id in converters}
+    for row_index, row in enumerate(rows):
+        for cell in row.cells:
+            if cell.column_id in column_cells:
+                positions, values = column_cells[cell.column_id]
+                positions.append(row_index)
+                values.append(cell.value)
+
+    # Convert each distinct value in a column once and fan the results back out to the rows.
+    # Values are keyed with their type because True == 1 == 1.0 but each converts differently.
+    for column_id, (positions, values) in column_cells.items():
+        field, convert = converters[column_id]
+        keys = [(type(value), value) for value in values]
+        converted = {key: convert(key[1]) for key in dict.fromkeys(keys)}
+        for row_index, key in zip(positions, keys):
+            records[row_index][field] = converted[key]
+
+    return dict(zip(row_ids, records))
+
+# Helper function to quote a value for use in a where clause.
+def sql_quote(value):
+    """Return the value as a single-quoted SQL string literal with embedded quotes escaped."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+# Helper function to split a large set of values into bounded "IN (...)" where clauses.
+def build_in_clauses(field, values, max_values=None, max_length=None):
+    """Yield de-duplicated, escaped "field IN (...)" clauses that stay within the size limits."""
+    max_values = max_values or max_in_clause_values
+    max_length = max_length or max_where_clause_length
+    prefix = f"{field} IN ("
+    chunk, chunk_length = [], len(prefix) + 1
+    for value in dict.fromkeys(v for v in values if v is not None):
+        quoted = sql_quote(value)
+        if chunk and (len(chunk) >= max_values or chunk_length + len(quoted) + 2 > max_length):
+            yield prefix + ", ".join(chunk) + ")"
+            chunk, chunk_length = [], len(prefix) + 1
+        chunk.append(quoted)
+        chunk_length += len(quoted) + 2
+    if chunk:
+        yield prefix + ", ".join(chunk) + ")"
+
+# Pattern for Parcel ID cells that actually contain geographic coordinates.
+coordinate_pattern = re.compile(r"\d{1,3}°\s?\d{1,2}'\d{1,2}\.\d{1,2}\"[NS]?,\s?-?\s?\d{1,3}°\s?\d{1,2}'\d{1,2}\.\d{1,2}\"[EW]?")
+
+# Separators used when a single Smartsheet cell lists more than one Parcel ID.
+parcel_id_separator = re.compile(r"[,;\n]+")
+
+# Helper function to split a "Parcel ID Number(s)" cell into individual Parcel IDs.
+def split_parcel_ids(value):
+    """Return the individual Parcel IDs listed in a Smartsheet cell, skipping blanks and coordinates."""
+    if not value or value in ['N/A', '', 'None'] or coordinate_pattern.match(value):
+        return []
+    parcel_ids = (pid.strip() for pid in parcel_id_separator.split(value))
+    return [pid for pid in parcel_ids if pid and pid not in ['N/A', 'None']]
+
+# Helper function to index Smartsheet records by Parcel ID in a single pass.
+def build_parcel_index(smartsheet_data, smartsheet_parcel_id_field='Parcel_ID_Numbers', claimed_parcel_ids=None):
+    """Map each Parcel ID to the first Smartsheet record that lists it.
+
+    Parcel IDs in claimed_parcel_ids were already used by an earlier page of the sheet and
+    are skipped; newly indexed IDs are added to the set.
+    """
+    parcel_index = {}
+    duplicate_ids = set()
+    claimed_parcel_ids = set() if claimed_parcel_ids is None else claimed_parcel_ids
+    for record in smartsheet_data.values():
+        for parcel_id in split_parcel_ids(record.get(smartsheet_parcel_id_field)):
+            if parcel_id in parcel_index or parcel_id in claimed_parcel_ids:
+                duplicate_ids.add(parcel_id)
+                continue
+            parcel_index[parcel_id] = record
+    claimed_parcel_ids.update(parcel_index)
+    if duplicate_ids:
+        print(f"{len(duplicate_ids)} Parcel ID(s) appear on more than one Smartsheet row; the first row is used.")
+    return parcel_index
+
+# Feature service field types that are compared as numbers or as dates when diffing. The names
+# cover both arcpy.ListFields types and the esriFieldType* names returned by the REST API.
+numeric_field_types = {'SmallInteger', 'Integer', 'BigInteger', 'Single', 'Double', 'OID', 'OID64'}
+date_field_types = {'Date', 'DateOnly', 'TimestampOffset'}
+diff_date_formats = ["%m/%d/%y %I:%M %p", "%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]
+
+# Helper function to classify a feature service field type for diffing.
+def field_kind(field_type):
+    """Return 'numeric', 'date' or 'text' for an arcpy or REST field type name."""
+    field_type = str(field_type).replace('esriFieldType', '')
+    if field_type in numeric_field_types:
+        return 'numeric'
+    if field_type in date_field_types:
+        return 'date'
+    return 'text'
+
+# Helper function to normalise a value so feature service and Smartsheet values compare equal.
+def normalize_for_diff(value, kind='text'):
+    """Return the value in a comparable string form for its field kind, or None for blanks.
+
+    Only numeric fields coerce text to numbers, so text such as "007" or a long ID keeps its
+    exact characters. Date fields compare in the format the Smartsheet dates are written in.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%m/%d/%y %I:%M %p")
+    if isinstance(value, str):
+        value = value.strip()
+        if value in ['', 'None']:
+            return None
+        if kind == 'numeric':
+            try:
+                return str(int(value)) if value.lstrip('+-').isdigit() else format_value(float(value))
+            except ValueError:
+                return value
+        if kind == 'date':
+            for date_format in diff_date_formats:
+                try:
+                    return datetime.strptime(value, date_format).strftime("%m/%d/%y %I:%M %p")
+                except ValueError:
+                    continue
+        return value
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    return format_value(value)
+
+# Compare a feature service row with the incoming Smartsheet record.
+def diff_row(row, record, update_fields, field_kinds=None):
+    """Return (index, field, current, incoming) for each mapped field whose value differs.
+
+    field_kinds maps field names to field_kind() results; fields not listed compare as text.
+    """
+    field_kinds = field_kinds or {}
+    changes = []
+    for i, field in enumerate(update_fields, start=1):
+        incoming = record.get(field_mapping.get(field, field), None)
+        kind = field_kinds.get(field, 'text')
+        if normalize_for_diff(row[i], kind) != normalize_for_diff(incoming, kind):
+            changes.append((i, field, row[i], incoming))
+    return changes
+
 # Function to update the feature service with data from Smartsheet.
-def append_to_feature_service(fc, smartsheet_data, field_mapping, parcel_id_list):
-    """Update feature service records with Smartsheet data."""
+def append_to_feature_service(fc, smartsheet_data, field_mapping, claimed_parcel_ids=None, dry_run=False,
+                              edit_writer=None):
+    """Update feature service records that differ from the Smartsheet data.
+
+    Returns counts of changed, unchanged and missing (in Smartsheet but not in the service) Parcel IDs.
+    With dry_run set, the planned edits are printed and nothing is written. When an ApplyEditsWriter
+    is passed, rows are read and written through the REST API instead of an arcpy UpdateCursor.
+    """
     update_fields = list(field_mapping.values())
     parcel_id_field = 'Parcel_ID'
-    smartsheet_parcel_id_field = 'Parcel_ID_Numbers'
-
-    # Identify and remove any Parcel IDs that are actually geographic coordinates.
-    coordinate_pattern = re.compile(r"\d{1,3}°\s?\d{1,2}'\d{1,2}\.\d{1,2}\"[NS]?,\s?-?\s?\d{1,3}°\s?\d{1,2}'\d{1,2}\.\d{1,2}\"[EW]?")
-    filtered_parcel_ids = [pid for pid in parcel_id_list if not coordinate_pattern.match(pid)]
-
-    # Construct a SQL query to select rows that match the filtered Parcel IDs.
-    sql_query = f"{parcel_id_field} IN ('{', '.join(filtered_parcel_ids)}')"
-    print(sql_query)
-
-    # Update rows in the feature service where the Parcel_ID matches.
-    with arcpy.da.UpdateCursor(fc, [parcel_id_field] + update_fields, where_clause=sql_query) as cursor:
-        for row in cursor:
-            parcel_id = row[0]  # First column is Parcel_ID.
-            if parcel_id in parcel_id_list:
-                # Find the corresponding record in Smartsheet data.
-                record = next((rec for rec in smartsheet_data.values() if rec.get(smartsheet_parcel_id_field) == parcel_id), None)
-                if record:
-                    # Update each field with the value from the corresponding Smartsheet record.
-                    for i, field in enumerate(update_fields, start=1):
-                        row[i] = record.get(field_mapping.get(field, field), None)
+    counts = {'changed': 0, 'unchanged': 0, 'missing': 0}
+
+    # Index the Smartsheet records by Parcel ID once instead of scanning them for every row.
+    parcel_index = build_parcel_index(smartsheet_data, claimed_parcel_ids=claimed_parcel_ids)
+    if not parcel_index:
+        print("No Parcel IDs found in Smartsheet data.")
+        return counts
+
+    # Construct bounded SQL queries to select rows that match the indexed Parcel IDs.
+    sql_queries = list(build_in_clauses(parcel_id_field, parcel_index))
+    print(f"Querying {len(parcel_index)} Parcel IDs in {len(sql_queries)} chunk(s).")
+    matched_parcel_ids = set()
+
+    # Field types decide how values are compared. The REST writer reads them from the layer info.
+    if edit_writer:
+        field_kinds = {name: field_kind(field_type) for name, field_type in edit_writer.describe().items()}
+    else:
+        field_kinds = {field.name: field_kind(field.type) for field in arcpy.ListFields(fc)}
+
+    def plan_row_update(row):
+        """Return the changed fields for a feature row, or None if it should not be written."""
+        parcel_id = row[0]  # First column is Parcel_ID.
+        record = parcel_index.get(parcel_id)
+        if not record:
+            return None
+        matched_parcel_ids.add(parcel_id)
+
+        # Only write rows where at least one mapped field actually changed.
+        changes = diff_row(row, record, update_fields, field_kinds)
+        if not changes:
+            counts['unchanged'] += 1
+            return None
+        counts['changed'] += 1
+
+        if dry_run:
+            for _, field, current, incoming in changes:
+                print(f"[dry run] Parcel_ID {parcel_id}: {field} {current!r} -> {incoming!r}")
+            return None
+        print(f"Updating Parcel_ID {parcel_id} ({len(changes)} field(s) changed).")
+        return changes
+
+    # Update rows in the feature service where the Parcel_ID matches, one chunk at a time.
+    for sql_query in sql_queries:
+        if edit_writer:
+            for objectid, row in edit_writer.query_rows(sql_query, [parcel_id_field] + update_fields):
+                changes = plan_row_update(row)
+                if changes:
+                    edit_writer.update({edit_writer.objectid_field: objectid, **{field: incoming for _, field, _, incoming in changes}})
+            continue
+
+        with arcpy.da.UpdateCursor(fc, [parcel_id_field] + update_fields, where_clause=sql_query) as cursor:
+            count_metric('feature_service_api_calls')
+            for row in cursor:
+                changes = plan_row_update(row)
+                if changes:
+                    # Update each changed field with the value from the corresponding Smartsheet record.
+                    for i, _, _, incoming in changes:
+                        row[i] = incoming
                     cursor.updateRow(row)
-                    print(f"Updated Parcel_ID {parcel_id} with new data.")
-
-# Fetch all Smartsheet sheets and identify the one to process.
-response = smartsheet_client.Sheets.list_sheets(include_all=True)
-sheets = response.data
-parcel_id_list = []
-
-sheet_id = next((sheet.id for sheet in sheets if sheet.name == "REPLACE_WITH_SHEET_NAME"), None)
-
-if sheet_id:
-    # Load the sheet and map its columns for easier processing.
-    sheet = smartsheet_client.Sheets.get_sheet(sheet_id)
-    col_id_to_title = {col.id: col.title for col in sheet.columns}
-    smartsheet_data = {}
-
-    # Process each row in the sheet.
-    for row in sheet.rows:
-        row_id = format_value(row.id)
-        row_data = {
-            row_id_field: row_id,
-            **{field_mapping.get(col_id_to_title[cell.column_id], col_id_to_title[cell.column_id]): format_date(cell.value) if isinstance(cell.value, str) and 'T' in cell.value else str(cell.value)
-               for cell in row.cells if col_id_to_title.get(cell.column_id) in field_mapping}
-        }
-        # Store valid Parcel IDs in the list.
-        parcel_id = row_data.get('Parcel_ID_Numbers')
-        if parcel_id and parcel_id not in ['N/A', '', 'None']:
-            parcel_id_list.append(parcel_id)
-        smartsheet_data[row_id] = row_data
-
-    # Append data to the feature service.
-    append_to_feature_service(feature_service_url, smartsheet_data, field_mapping, parcel_id_list)
+                    count_metric('feature_service_api_calls')
+
+    counts['missing'] = len(parcel_index) - len(matched_parcel_ids)
+    return counts
+
+# Load the version and row modifiedAt watermark saved by the last successful sync.
+def load_sync_state(sheet_id):
+    """Return the saved sync state for this sheet, or None if a full sync is required."""
+    if not incremental_sync or force_full_resync or not os.path.exists(sync_state_file):
+        return None
+    with open(sync_state_file, 'r') as state_file:
+        state = json.load(state_file)
+    if state.get('sheet_id') != sheet_id or not state.get('rows_modified_since'):
+        return None
+    return state
+
+# Save the sheet version and the time the sheet was first read so the next run can start from it.
+def save_sync_state(sheet_id, sheet_version, rows_modified_since):
+    """Write the sync state atomically so an interrupted run never leaves a partial file."""
+    state = {
+        'sheet_id': sheet_id,
+        'version': sheet_version,
+        'rows_modified_since': rows_modified_since.isoformat() if rows_modified_since else None
+    }
+    temp_file = sync_state_file + '.tmp'
+    with open(temp_file, 'w') as state_file:
+        json.dump(state, state_file, indent=2)
+    os.replace(temp_file, sync_state_file)
+
+# Work out where this run starts from: a saved watermark, or None for a full sync.
+def get_sync_start(sheet_id):
+    """Return the rows_modified_since datetime for this run, or None to fetch every row."""
+    state = load_sync_state(sheet_id)
+    if state:
+        modified_since = datetime.fromisoformat(state['rows_modified_since'])
+        print(f"Incremental sync: fetching rows modified since {modified_since} (last version {state['version']}).")
+        return modified_since
+    print("Full sync: fetching every row in the sheet.")
+    return None
+
+# Check the sheet version before fetching any rows.
+def is_sheet_unchanged(client, sheet_id):
+    """Return True if the sheet version matches the one saved by the last successful sync."""
+    state = load_sync_state(sheet_id)
+    if not state or state.get('version') is None:
+        return False
+    current_version = client.Sheets.get_sheet_version(sheet_id).version
+    count_metric('smartsheet_api_calls')
+    return current_version == state['version']
+
+# Work out the watermark for the next run once the first page has been fetched.
+def next_sync_watermark(first_page, fetch_started):
+    """Return the sheet's modifiedAt on the first page, or the local start time if that is earlier.
+
+    Rows edited while later pages are being fetched are newer than this, so the next run fetches
+    them again. The newest row modifiedAt seen would skip them.
+    """
+    return min(timestamp for timestamp in [first_page.modified_at, fetch_started] if timestamp)
+
+# Page through the sheet so only one page of rows is held in memory at a time.
+def iter_sheet_pages(client, sheet_id, modified_since=None):
+    """Yield the sheet one page of rows at a time, limited to changed rows when modified_since is set."""
+    page = 1
+    while True:
+        kwargs = {'page_size': sheet_page_size, 'page': page}
+        if modified_since:
+            # The SDK puts this in the query string with str(), so send ISO 8601 text rather than a datetime.
+            kwargs['rows_modified_since'] = modified_since.isoformat()
+        with timed_phase('sheet_fetch'):
+            sheet_page = client.Sheets.get_sheet(sheet_id, **kwargs)
+        count_metric('smartsheet_api_calls')
+        count_metric('rows_fetched', len(sheet_page.rows))
+        yield sheet_page
+        if len(sheet_page.rows) < sheet_page_size or page * sheet_page_size >= (sheet_page.total_row_count or 0):
+            break
+        page += 1
+
+# Find the sheet by name, paging through the sheet list and stopping once it is found.
+def find_sheet_id(client, sheet_name):
+    """Return the ID of the first sheet with this name, or None."""
+    page = 1
+    while True:
+        response = client.Sheets.list_sheets(page_size=100, page=page)
+        count_metric('smartsheet_api_calls')
+        sheet_id = next((sheet.id for sheet in response.data if sheet.name == sheet_name), None)
+        if sheet_id or page >= (response.total_pages or 0):
+            return sheet_id
+        page += 1
+
+# Identify the sheet to process.
+sheet_id = find_sheet_id(smartsheet_client, "REPLACE_WITH_SHEET_NAME")
+synced_row_ids = set()
+
+sheet_unchanged = bool(sheet_id) and is_sheet_unchanged(smartsheet_client, sheet_id)
+if sheet_unchanged:
+    print("Sheet version unchanged since the last sync; no rows to fetch.")
+
+if sheet_id and not sheet_unchanged:
+    with timed_phase('smartsheet_sync'):
+        sync_watermark = get_sync_start(sheet_id)
+        fetch_started = datetime.now(pytz.utc) - sync_overlap
+        next_watermark = None
+        sheet_version = None
+        column_converters = None
+        claimed_parcel_ids = set()
+        update_counts = {'changed': 0, 'unchanged': 0, 'missing': 0}
+        edit_writer = None
+        if write_backend == 'rest':
+            edit_writer = ApplyEditsWriter(feature_service_url, token=feature_service_token,
+                                           batch_size=apply_edits_batch_size, max_workers=apply_edits_workers,
+                                           date_formats=diff_date_formats)
+        elif arcpy is None:
+            raise ImportError("arcpy is required for write_backend = 'cursor'; use 'rest' where arcpy is not installed.")
+
+        # Stream the sheet page by page through the transform and the feature update.
+        for sheet_page in iter_sheet_pages(smartsheet_client, sheet_id, sync_watermark):
+            if column_converters is None:
+                sheet_version = sheet_page.version
+                next_watermark = next_sync_watermark(sheet_page, fetch_started)
+                column_converters = build_column_converters(sheet_page.columns)
+
+            # Convert the rows column by column using the converters for each column type.
+            with timed_phase('transform'):
+                smartsheet_data = transform_rows(sheet_page.rows, column_converters)
+
+            # Append data to the feature service.
+            with timed_phase('feature_update'):
+                page_counts = append_to_feature_service(feature_service_url, smartsheet_data, field_mapping,
+                                                        claimed_parcel_ids, dry_run=dry_run, edit_writer=edit_writer)
+            for key, count in page_counts.items():
+                update_counts[key] += count
+
+            # Keep only the row IDs for attachment discovery.
+            synced_row_ids.update(row.id for row in sheet_page.rows)
+
+        with timed_phase('feature_update'):
+            edit_results = edit_writer.close() if edit_writer else {'requests': 0, 'failed_batches': 0}
+        count_metric('feature_service_api_calls', edit_results['requests'])
+        for key, count in update_counts.items():
+            count_metric(f'features_{key}', count)
+        print(f"{len(synced_row_ids)} row(s) synced from sheet version {sheet_version}.")
+        print(f"Features {'to change' if dry_run else 'changed'}: {update_counts['changed']}, "
+              f"unchanged: {update_counts['unchanged']}, Parcel IDs missing from the service: {update_counts['missing']}")
+
+        # Record the new watermark only after the feature service has been updated.
+        if incremental_sync and not dry_run and not edit_results['failed_batches']:
+            save_sync_state(sheet_id, sheet_version, next_watermark)
+
+# Attachment download settings. Downloads share one pooled HTTP session, and no more than
+# max_in_flight_downloads attachments are queued or downloading at once.
+download_workers = 4
+download_chunk_size = 1024 * 1024
+max_in_flight_downloads = download_workers * 2
+max_download_retries = 5
+
+download_session = requests.Session()
+download_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=download_workers))
+
+# Helper function to GET a URL through the pooled session, backing off on HTTP 429.
+def get_with_retry(url, **kwargs):
+    """Return a streaming response, retrying while the server answers 429 Too Many Requests."""
+    for attempt in range(max_download_retries):
+        response = download_session.get(url, stream=True, timeout=60, **kwargs)
+        if response.status_code != 429 or attempt == max_download_retries - 1:
+            return response
+        retry_after = response.headers.get('Retry-After', '')
+        delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+        response.close()
+        print(f"Rate limited downloading attachment; retrying in {delay} seconds.")
+        time.sleep(delay)
+
+# Helper function to hash a file's contents in fixed-size blocks.
+def file_sha256(file_path, block_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a local file."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Content-addressed store for downloaded attachments. Each file is stored once under its
+# SHA-256 and hardlinked into every Row_<id> folder that has it attached. Partial downloads
+# are kept in the "partial" folder and resumed with HTTP Range requests on the next run.
+attachment_store_folder = os.path.join(download_folder, '_attachment_store')
+partial_download_folder = os.path.join(attachment_store_folder, 'partial')
+attachment_index_file = os.path.join(attachment_store_folder, 'attachment_index.json')
+os.makedirs(partial_download_folder, exist_ok=True)
+
+# Map of Smartsheet attachment ID to the hash and size of its content in the store.
+attachment_index = {}
+if os.path.exists(attachment_index_file):
+    with open(attachment_index_file, 'r') as index_file:
+        attachment_index = json.load(index_file)
+attachment_index_lock = threading.Lock()
+
+# Save the attachment index atomically.
+def save_attachment_index():
+    """Write the attachment ID to content hash index next to the store."""
+    with attachment_index_lock:
+        temp_file = attachment_index_file + '.tmp'
+        with open(temp_file, 'w') as index_file:
+            json.dump(attachment_index, index_file)
+        os.replace(temp_file, attachment_index_file)
+
+# Helper function to find where a hash lives in the store.
+def store_path(content_hash):
+    """Return the store path for a SHA-256 hex digest."""
+    return os.path.join(attachment_store_folder, content_hash[:2], content_hash)
+
+# Add a complete, verified file to the store and record it against the attachment ID.
+def add_to_store(attachment_id, file_path):
+    """Move or link the file into the store and return its content hash."""
+    content_hash = file_sha256(file_path)
+    stored_file = store_path(content_hash)
+    os.makedirs(os.path.dirname(stored_file), exist_ok=True)
+    if not os.path.exists(stored_file):
+        os.replace(file_path, stored_file)
+    elif os.path.dirname(file_path) == partial_download_folder:
+        # Identical content is already stored, so the new copy is not needed.
+        os.remove(file_path)
+    with attachment_index_lock:
+        attachment_index[str(attachment_id)] = {'hash': content_hash, 'size': os.path.getsize(stored_file)}
+    return content_hash
+
+# Place a stored file into a row folder, hardlinking where the filesystem allows it.
+def link_from_store(content_hash, local_file_path):
+    """Replace local_file_path with a link to (or copy of) the stored content."""
+    stored_file = store_path(content_hash)
+    temp_path = local_file_path + '.linking'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(stored_file, temp_path)
+    except OSError:
+        shutil.copy2(stored_file, temp_path)
+    os.replace(temp_path, local_file_path)
+
+# Download an attachment into the partial folder, resuming from any bytes already there.
+def download_to_partial(download_url, partial_path):
+    """Download (or finish downloading) a file, verify its final size and return the bytes written."""
+    existing_size = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+    headers = {'Range': f'bytes={existing_size}-'} if existing_size else {}
+    written = 0
+
+    with get_with_retry(download_url, headers=headers) as response:
+        if response.status_code == 416:
+            # The partial file may already hold every byte; the server reports the real size.
+            content_range = response.headers.get('Content-Range', '')
+            if '/' not in content_range or not content_range.rsplit('/', 1)[-1].isdigit():
+                expected_size = None
+            else:
+                expected_size = int(content_range.rsplit('/', 1)[-1])
+            mode = None
+        elif response.status_code == 206:
+            expected_size = int(response.headers['Content-Range'].rsplit('/', 1)[-1])
+            mode = 'ab'
+        else:
+            response.raise_for_status()
+            expected_size = int(response.headers.get('Content-Length', -1))
+            mode = 'wb'
+
+        if mode:
+            with open(partial_path, mode) as file:
+                for chunk in response.iter_content(download_chunk_size):
+                    file.write(chunk)
+                    written += len(chunk)
+                    count_metric('attachment_bytes_downloaded', len(chunk))
+
+    if expected_size is None:
+        # Without the total size the partial file cannot be verified, so download it again.
+        os.remove(partial_path)
+        return download_to_partial(download_url, partial_path)
+
+    actual_size = os.path.getsize(partial_path)
+    if expected_size >= 0 and actual_size != expected_size:
+        if actual_size > expected_size:
+            os.remove(partial_path)
+        raise IOError(f"Incomplete download: expected {expected_size} bytes, got {actual_size}")
+    return written
 
 # Function to download attachments from Smartsheet rows.
 def download_attachment(attachment, row_folder, sheet_id):
     """Download a single attachment to a local folder."""
     file_name = attachment.name
     local_file_path = os.path.join(row_folder, file_name)
+    known = attachment_index.get(str(attachment.id))
 
-    # Skip downloading if the file already exists locally.
-    if os.path.exists(local_file_path):
+    # Skip the download if this attachment's verified content is already in the store.
+    if known and os.path.exists(store_path(known['hash'])):
+        if not (os.path.exists(local_file_path) and os.path.getsize(local_file_path) == known['size']):
+            link_from_store(known['hash'], local_file_path)
+        count_metric('attachments_skipped')
         return
 
+    # Only partial files this code wrote for the attachment ID are resumed. A file left in the row
+    # folder by earlier versions of the script may be an older version with the same name, so it is
+    # downloaded again in full and replaced by a link to the stored content.
+    partial_path = os.path.join(partial_download_folder, f"{attachment.id}.part")
+
     # Get the download URL and save the file.
     attachment_details = smartsheet_client.Attachments.get_attachment(sheet_id, attachment.id)
-    download_url = attachment_details.url
-    response = requests.get(download_url, stream=True)
-    if response.status_code == 200:
-        with open(local_file_path, 'wb') as file:
-            for chunk in response.iter_content(1024):
-                file.write(chunk)
+    count_metric('smartsheet_api_calls')
+    written = download_to_partial(attachment_details.url, partial_path)
+    content_hash = add_to_store(attachment.id, partial_path)
+    link_from_store(content_hash, local_file_path)
+    if written:
+        count_metric('attachments_downloaded')
         print(f"Attachment '{file_name}' downloaded to: {local_file_path}")
+    else:
+        count_metric('attachments_skipped')
+
+# Syncs of up to this many rows list attachments row by row; larger ones page through the
+# sheet-level listing so small incremental runs never load every attachment in the sheet.
+per_row_listing_limit = 50
+attachment_listing_page_size = 500
+
+# Helper function to page through a Smartsheet listing one page at a time.
+def iter_listing(list_page):
+    """Yield the items of a paged listing, where list_page(page) returns one IndexResult page."""
+    page = 1
+    while True:
+        with timed_phase('attachment_listing'):
+            response = list_page(page)
+        count_metric('smartsheet_api_calls')
+        yield from response.data
+        if page >= (response.total_pages or 0):
+            return
+        page += 1
+
+# Map discussions and comments on the synced rows to their row, for discussion-level attachments.
+def get_discussion_rows(sheet_id, row_ids):
+    """Return {discussion or comment ID: row ID} for every discussion on the given rows."""
+    discussion_rows = {}
+    for discussion in iter_listing(lambda page: smartsheet_client.Discussions.get_all_discussions(
+            sheet_id, include='comments', page_size=attachment_listing_page_size, page=page)):
+        if str(discussion.parent_type) == 'ROW' and discussion.parent_id in row_ids:
+            discussion_rows[discussion.id] = discussion.parent_id
+            discussion_rows.update((comment.id, discussion.parent_id) for comment in discussion.comments or [])
+    return discussion_rows
+
+# Yield the attachments of the synced rows, including those on their discussions.
+def iter_row_attachments(sheet_id, row_ids):
+    """Yield (row_id, attachment) for every attachment on the given rows and their discussions."""
+    if not row_ids:
+        return
+    if len(row_ids) <= per_row_listing_limit:
+        for row_id in row_ids:
+            list_page = functools.partial(smartsheet_client.Attachments.list_row_attachments, sheet_id, row_id,
+                                          attachment_listing_page_size)
+            for attachment in iter_listing(list_page):
+                count_metric('attachments_listed')
+                yield row_id, attachment
+        return
+
+    discussion_rows = get_discussion_rows(sheet_id, row_ids)
+    for attachment in iter_listing(lambda page: smartsheet_client.Attachments.list_all_attachments(
+            sheet_id, page_size=attachment_listing_page_size, page=page)):
+        if str(attachment.parent_type) == 'ROW':
+            row_id = attachment.parent_id
+        else:
+            row_id = discussion_rows.get(attachment.parent_id)
+        if row_id in row_ids:
+            count_metric('attachments_listed')
+            yield row_id, attachment
+
+# Read the download counters recorded in the run report.
+def get_download_counts():
+    """Return the listed, downloaded, skipped and failed attachment counts and the bytes downloaded."""
+    with metrics_lock:
+        counters = dict(run_report['counters'])
+    counts = {key: counters.get(f'attachments_{key}', 0) for key in ['listed', 'downloaded', 'skipped', 'failed']}
+    counts['bytes'] = counters.get('attachment_bytes_downloaded', 0)
+    return counts
+
+# Print download progress and throughput.
+def report_download_progress(start_time, final=False):
+    """Print the download counters and the average throughput so far."""
+    elapsed = max(time.monotonic() - start_time, 0.001)
+    stats = get_download_counts()
+    label = "Download summary" if final else "Download progress"
+    print(f"{label}: {stats['downloaded']} downloaded, {stats['skipped']} skipped, {stats['failed']} failed "
+          f"of {stats['listed']} listed; {stats['bytes'] / 1048576:.1f} MB at "
+          f"{stats['bytes'] / 1048576 / elapsed:.2f} MB/s")
 
 # Use a ThreadPoolExecutor to handle multiple attachment downloads simultaneously.
-with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-    future_to_attachment = {}
+# The semaphore applies backpressure so listing never runs far ahead of the downloads.
+download_start = time.monotonic()
+in_flight = threading.BoundedSemaphore(max_in_flight_downloads)
 
-    for row in sheet.rows:
-        row_id = row.id
-        row_folder = os.path.join(download_folder, f"Row_{row_id}")
-        os.makedirs(row_folder, exist_ok=True)
+# Attachments present locally after this run's downloads, as (row_id, file_name, file_path).
+# These drive the upload stage instead of a scan of every Row_ID in the feature service.
+run_attachment_files = []
+run_attachment_files_lock = threading.Lock()
+
+def on_download_done(future, attachment, row_id, row_folder):
+    """Release the in-flight slot, record the local file and report any download error."""
+    in_flight.release()
+    try:
+        future.result()
+        with run_attachment_files_lock:
+            run_attachment_files.append((str(row_id), attachment.name, os.path.join(row_folder, attachment.name)))
+    except Exception as exc:
+        count_metric('attachments_failed')
+        print(f"Error downloading attachment '{attachment.name}': {exc}")
+    counts = get_download_counts()
+    finished = counts['downloaded'] + counts['skipped'] + counts['failed']
+    if finished and finished % 50 == 0:
+        report_download_progress(download_start)
 
-        # Retrieve attachments for this row and submit them for download.
-        attachments = smartsheet_client.Attachments.list_row_attachments(sheet_id, row.id).data
-        for attachment in attachments:
+with timed_phase('attachment_download'):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=download_workers) as executor:
+        for row_id, attachment in iter_row_attachments(sheet_id, synced_row_ids):
+            row_folder = os.path.join(download_folder, f"Row_{row_id}")
+            if dry_run:
+                # Nothing is downloaded; the listed attachments only feed the planned uploads.
+                run_attachment_files.append((str(row_id), attachment.name, os.path.join(row_folder, attachment.name)))
+                continue
+            os.makedirs(row_folder, exist_ok=True)
+
+            in_flight.acquire()
             future = executor.submit(download_attachment, attachment, row_folder, sheet_id)
-            future_to_attachment[future] = attachment
+            future.add_done_callback(lambda done, attachment=attachment, row_id=row_id, row_folder=row_folder:
+                                     on_download_done(done, attachment, row_id, row_folder))
 
-    # Handle results and catch any errors during the download process.
-    for future in concurrent.futures.as_completed(future_to_attachment):
-        attachment = future_to_attachment[future]
-        try:
-            future.result()
-        except Exception as exc:
-            print(f"Error downloading attachment '{attachment.name}': {exc}")
+save_attachment_index()
+report_download_progress(download_start, final=True)
 
-# Initialize a log file to keep track of uploaded attachments.
+# Ledger of uploaded attachments keyed on (Row_ID, file name). It replaces the old xlsx log,
+# which is imported into the ledger once and then left untouched.
+ledger_file = os.path.join(download_folder, 'uploaded_attachments.db')
 log_file = os.path.join(download_folder, 'uploaded_attachments_log.xlsx')
+attachment_upload_chunk_size = 200
+
+# Open (and create if needed) the attachment ledger.
+def open_attachment_ledger():
+    """Return a connection to the ledger, importing the legacy xlsx log on first use."""
+    ledger = sqlite3.connect(ledger_file)
+    ledger.execute("PRAGMA journal_mode=WAL")
+    ledger.execute("PRAGMA synchronous=NORMAL")
+    with ledger:
+        ledger.execute(
+            "CREATE TABLE IF NOT EXISTS uploaded_attachments ("
+            "row_id TEXT NOT NULL, file_name TEXT NOT NULL, content_hash TEXT, uploaded_at TEXT, "
+            "PRIMARY KEY (row_id, file_name))"
+        )
+        ledger.execute("CREATE INDEX IF NOT EXISTS uploaded_attachments_hash ON uploaded_attachments (content_hash)")
+        ledger.execute("CREATE TABLE IF NOT EXISTS ledger_meta (key TEXT PRIMARY KEY, value TEXT)")
+        ledger.execute(
+            "CREATE TABLE IF NOT EXISTS pending_uploads ("
+            "row_id TEXT NOT NULL, file_name TEXT NOT NULL, file_path TEXT NOT NULL, "
+            "PRIMARY KEY (row_id, file_name))"
+        )
+    import_legacy_attachment_log(ledger)
+    return ledger
 
-# Create the log file if it doesn't exist.
-if not os.path.exists(log_file):
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.title = "Log"
-    sheet.append(['Row_ID', 'Attachment'])
-    workbook.save(log_file)
+# One-time import of the xlsx log written by earlier versions of this script.
+def import_legacy_attachment_log(ledger):
+    """Copy the Row_ID/Attachment pairs from the xlsx log into the ledger if not already done."""
+    if not os.path.exists(log_file):
+        return
+    if ledger.execute("SELECT 1 FROM ledger_meta WHERE key = 'legacy_log_imported'").fetchone():
+        return
+    workbook = load_workbook(log_file, read_only=True)
+    entries = [(str(row[0]), str(row[1]))
+               for row in workbook.active.iter_rows(min_row=2, values_only=True)
+               if row and row[0] is not None and row[1] is not None]
+    workbook.close()
+    with ledger:
+        ledger.executemany(
+            "INSERT OR IGNORE INTO uploaded_attachments (row_id, file_name) VALUES (?, ?)", entries
+        )
+        ledger.execute("INSERT INTO ledger_meta (key, value) VALUES ('legacy_log_imported', ?)",
+                       (datetime.now().isoformat(),))
+    print(f"Imported {len(entries)} entries from {log_file} into the attachment ledger.")
 
 # Check if an attachment has already been uploaded.
-def is_attachment_uploaded(row_id, file_name):
-    """Check the log to see if this attachment has already been uploaded."""
-    workbook = load_workbook(log_file)
-    sheet = workbook.active
-    for row in sheet.iter_rows(values_only=True):
-        if row == (str(row_id), file_name):
-            return True
-    return False
-
-# Log a newly uploaded attachment.
-def log_uploaded_attachment(row_id, file_name):
-    """Add a record of the uploaded attachment to the log file."""
-    workbook = load_workbook(log_file)
-    sheet = workbook.active
-    sheet.append([str(row_id), file_name])
-    workbook.save(log_file)
-
-# Prepare an attachment match table for uploading to the feature service.
-match_table = os.path.join(arcpy.env.scratchGDB, "AttachmentMatchTable")
-if arcpy.Exists(match_table):
-    arcpy.Delete_management(match_table)
-
-arcpy.CreateTable_management(arcpy.env.scratchGDB, "AttachmentMatchTable")
-arcpy.AddField_management(match_table, "Row_ID", "TEXT")
-arcpy.AddField_management(match_table, "ATTACHMENT", "TEXT")
-
-# Populate the match table with attachments that need to be uploaded.
-with arcpy.da.InsertCursor(match_table, ["Row_ID", "ATTACHMENT"]) as cursor:
-    with arcpy.da.SearchCursor(feature_service_url, ["Row_ID"]) as search_cursor:
-        for row in search_cursor:
-            row_id = str(row[0])
-            attachment_folder = os.path.join(download_folder, f'Row_{row_id}')
-
-            if os.path.exists(attachment_folder):
-                for file in os.listdir(attachment_folder):
-                    file_path = os.path.join(attachment_folder, file)
-
-                    # Only include files that haven't been logged as uploaded.
-                    if not is_attachment_uploaded(str(row_id), file):
-                        cursor.insertRow([row_id, file_path])
-                        log_uploaded_attachment(str(row_id), file)
-
-# Upload attachments to the feature service using the match table.
-arcpy.management.AddAttachments(
-    feature_service_url,
-    "Row_ID",
-    match_table,
-    "Row_ID",
-    "ATTACHMENT"
-)
-
-print("Attachments added successfully.")
+def is_attachment_uploaded(ledger, row_id, file_name):
+    """Check the ledger to see if this attachment has already been uploaded."""
+    return ledger.execute(
+        "SELECT 1 FROM uploaded_attachments WHERE row_id = ? AND file_name = ?", (str(row_id), file_name)
+    ).fetchone() is not None
+
+# Record a batch of uploaded attachments in a single transaction.
+def log_uploaded_attachments(ledger, entries):
+    """Add (row_id, file_name, content_hash) records to the ledger and clear them from pending uploads."""
+    if not entries:
+        return
+    uploaded_at = datetime.now().isoformat()
+    with ledger:
+        ledger.executemany(
+            "INSERT OR REPLACE INTO uploaded_attachments (row_id, file_name, content_hash, uploaded_at) "
+            "VALUES (?, ?, ?, ?)",
+            [(str(row_id), file_name, content_hash, uploaded_at) for row_id, file_name, content_hash in entries]
+        )
+        ledger.executemany(
+            "DELETE FROM pending_uploads WHERE row_id = ? AND file_name = ?",
+            [(str(row_id), file_name) for row_id, file_name, _ in entries]
+        )
+
+# Queue this run's local attachment files for upload unless the ledger already has them.
+def queue_pending_uploads(ledger, files):
+    """Add (row_id, file_name, file_path) entries that have not been uploaded to pending uploads."""
+    new_files = []
+    for row_id, file_name, file_path in files:
+        with timed_phase('ledger_check'):
+            if not is_attachment_uploaded(ledger, row_id, file_name):
+                new_files.append((row_id, file_name, file_path))
+    with ledger:
+        ledger.executemany("INSERT OR REPLACE INTO pending_uploads (row_id, file_name, file_path) VALUES (?, ?, ?)",
+                           new_files)
+
+# Pending uploads include files from earlier runs whose upload did not complete.
+def get_pending_uploads(ledger):
+    """Return every (row_id, file_name, file_path) still waiting to be uploaded."""
+    return ledger.execute("SELECT row_id, file_name, file_path FROM pending_uploads ORDER BY row_id").fetchall()
+
+# Remove pending uploads that can never succeed.
+def drop_pending_uploads(ledger, entries):
+    """Delete (row_id, file_name, file_path) entries from pending uploads."""
+    with ledger:
+        ledger.executemany("DELETE FROM pending_uploads WHERE row_id = ? AND file_name = ?",
+                           [(row_id, file_name) for row_id, file_name, _ in entries])
+
+# Look up which Row_IDs exist in the feature service, querying only the IDs we need.
+def find_existing_row_ids(fc, row_ids):
+    """Return the subset of row_ids that have a feature in the service."""
+    existing = set()
+    for sql_query in build_in_clauses(row_id_field, row_ids):
+        with arcpy.da.SearchCursor(fc, [row_id_field], sql_query) as search_cursor:
+            count_metric('feature_service_api_calls')
+            existing.update(str(row[0]) for row in search_cursor)
+    return existing
+
+# Upload one chunk of attachments and mark it uploaded only after AddAttachments succeeds.
+def upload_attachment_chunk(ledger, match_table, chunk):
+    """Load the chunk into the match table, run AddAttachments and record the chunk in the ledger."""
+    arcpy.TruncateTable_management(match_table)
+    with arcpy.da.InsertCursor(match_table, ["Row_ID", "ATTACHMENT"]) as cursor:
+        for row_id, _, file_path in chunk:
+            cursor.insertRow([row_id, file_path])
+
+    with timed_phase('add_attachments'):
+        arcpy.management.AddAttachments(feature_service_url, "Row_ID", match_table, "Row_ID", "ATTACHMENT")
+    count_metric('feature_service_api_calls')
+    count_metric('attachments_uploaded', len(chunk))
+
+    log_uploaded_attachments(ledger, [(row_id, file_name, file_sha256(file_path))
+                                      for row_id, file_name, file_path in chunk])
+
+# Print the uploads a real run would make, reading the ledger without changing it.
+def print_planned_uploads(files):
+    """Print this run's files that the ledger has not recorded as uploaded, plus earlier pending uploads."""
+    planned = list(files)
+    if os.path.exists(ledger_file):
+        ledger = sqlite3.connect(f"file:{ledger_file}?mode=ro", uri=True)
+        try:
+            planned = [entry for entry in planned if not is_attachment_uploaded(ledger, entry[0], entry[1])]
+            planned += [entry for entry in get_pending_uploads(ledger) if entry not in planned]
+        finally:
+            ledger.close()
+    for row_id, file_name, _ in planned:
+        print(f"[dry run] Row_ID {row_id}: upload '{file_name}'")
+    print(f"[dry run] {len(planned)} attachment(s) would be uploaded.")
+    return planned
+
+if dry_run:
+    print_planned_uploads(run_attachment_files)
+elif arcpy is None:
+    # AddAttachments and the match table need arcpy, so the files are only queued in the ledger
+    # and uploaded by the next run that has arcpy.
+    attachment_ledger = open_attachment_ledger()
+    queue_pending_uploads(attachment_ledger, run_attachment_files)
+    print(f"arcpy is not installed; {len(get_pending_uploads(attachment_ledger))} attachment(s) left pending upload.")
+    attachment_ledger.close()
+else:
+    attachment_ledger = open_attachment_ledger()
+
+    # Prepare an attachment match table for uploading to the feature service.
+    match_table = os.path.join(arcpy.env.scratchGDB, "AttachmentMatchTable")
+    if arcpy.Exists(match_table):
+        arcpy.Delete_management(match_table)
+
+    arcpy.CreateTable_management(arcpy.env.scratchGDB, "AttachmentMatchTable")
+    arcpy.AddField_management(match_table, "Row_ID", "TEXT")
+    arcpy.AddField_management(match_table, "ATTACHMENT", "TEXT")
+
+    # Queue the files from this run, then upload everything pending in bounded chunks so a
+    # failed chunk does not void the others and is retried on the next run.
+    with timed_phase('attachment_upload'):
+        queue_pending_uploads(attachment_ledger, run_attachment_files)
+        pending_uploads = get_pending_uploads(attachment_ledger)
+        existing_row_ids = find_existing_row_ids(feature_service_url, {entry[0] for entry in pending_uploads})
+
+        # Entries whose file is gone or whose Row_ID has no feature would be retried forever.
+        dead_uploads = [entry for entry in pending_uploads
+                        if not os.path.exists(entry[2]) or entry[0] not in existing_row_ids]
+        if dead_uploads:
+            drop_pending_uploads(attachment_ledger, dead_uploads)
+            print(f"Removed {len(dead_uploads)} pending upload(s) with a missing file or no matching Row_ID.")
+        dead_uploads = set(dead_uploads)
+        pending_uploads = [entry for entry in pending_uploads if entry not in dead_uploads]
+        print(f"{len(pending_uploads)} attachment(s) to upload in chunks of {attachment_upload_chunk_size}.")
+
+        failed_chunks = 0
+        for start in range(0, len(pending_uploads), attachment_upload_chunk_size):
+            chunk = pending_uploads[start:start + attachment_upload_chunk_size]
+            try:
+                upload_attachment_chunk(attachment_ledger, match_table, chunk)
+            except Exception as exc:
+                failed_chunks += 1
+                print(f"Error uploading attachments {start + 1}-{start + len(chunk)}: {exc}")
+
+    attachment_ledger.close()
+
+    if failed_chunks:
+        print(f"{failed_chunks} attachment chunk(s) failed and will be retried on the next run.")
+    else:
+        print("Attachments added successfully.")
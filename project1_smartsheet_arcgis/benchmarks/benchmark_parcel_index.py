@@ -0,0 +1,119 @@
+"""Benchmark the feature update phase at growing sheet sizes and check it scales linearly.
+
+Builds a synthetic sheet and a matching feature layer at each size, runs append_to_feature_service
+against a fake arcpy UpdateCursor and prints the time per row:
+
+    python benchmarks/benchmark_parcel_index.py --sizes 10000 40000 160000
+
+The run fails if the time per row at any size is more than --max-ratio times the fastest size, which
+is what the old per-row scan of every Smartsheet record would do as the sheet grows.
+"""
+import argparse
+import contextlib
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from benchmark_transform import load_script  # noqa: E402
+
+FIELD_MAPPING = {'Row_ID': 'Row_ID', 'SMARTNAME': 'SMARTNAME', 'Parcel ID Number(s)': 'Parcel_ID_Numbers'}
+
+
+class FakeFeatureLayer:
+    """Serves feature rows through arcpy.da.UpdateCursor's interface and counts the rows written."""
+
+    def __init__(self, features):
+        self.features = features
+        self.updated = 0
+
+    @contextlib.contextmanager
+    def UpdateCursor(self, fc, fields, where_clause=None):
+        parcel_ids = [value.replace("''", "'") for value in re.findall(r"'((?:[^']|'')*)'", where_clause or "")]
+        yield FakeCursor([list(self.features[pid]) for pid in parcel_ids if pid in self.features], self)
+
+
+class FakeCursor:
+    """The rows one UpdateCursor call returns; updateRow writes back to the layer."""
+
+    def __init__(self, rows, layer):
+        self.rows = rows
+        self.layer = layer
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def updateRow(self, row):
+        self.layer.updated += 1
+        self.layer.features[row[0]] = list(row)
+
+
+def make_sheet(row_count, seed=0):
+    """Return Smartsheet records and the feature rows they map to.
+
+    Some cells list two Parcel IDs and some Parcel IDs appear on two rows. Every tenth feature has a
+    stale SMARTNAME so the update writes a share of the rows.
+    """
+    rng = random.Random(seed)
+    smartsheet_data, features = {}, {}
+    for i in range(row_count):
+        row_id = str(4000000000000 + i)
+        parcel_ids = [f"APN-{i:07d}"]
+        if rng.random() < 0.1:
+            parcel_ids.append(f"APN-{i:07d}-B")
+        if i and rng.random() < 0.05:
+            parcel_ids.append(f"APN-{rng.randrange(i):07d}")
+        record = {'Row_ID': row_id, 'SMARTNAME': f"SITE-{i}", 'Parcel_ID_Numbers': ", ".join(parcel_ids)}
+        smartsheet_data[row_id] = record
+        for parcel_id in parcel_ids:
+            smartsheet_name = record['SMARTNAME'] if i % 10 else f"OLD-{i}"
+            features.setdefault(parcel_id, [parcel_id, row_id, smartsheet_name, record['Parcel_ID_Numbers']])
+    return smartsheet_data, features
+
+
+def run(script, sizes, max_ratio=2.0):
+    """Time the feature update at each sheet size and return the timings.
+
+    Raises AssertionError if the time per row grows by more than max_ratio across the sizes.
+    """
+    results = []
+    # Warm up on the smallest size so the first timing does not include one-off costs.
+    for size in [min(sizes)] + list(sizes):
+        smartsheet_data, features = make_sheet(size)
+        layer = FakeFeatureLayer(features)
+        arcpy = SimpleNamespace(da=layer, ListFields=lambda fc: [])
+        with mock.patch.object(script, "arcpy", arcpy), mock.patch.object(script, "field_mapping", FIELD_MAPPING), \
+                contextlib.redirect_stdout(open(os.devnull, 'w')):
+            start = time.perf_counter()
+            counts = script.append_to_feature_service("features", smartsheet_data, FIELD_MAPPING)
+            seconds = time.perf_counter() - start
+        results.append({'rows': size, 'seconds': seconds, 'seconds_per_row': seconds / size,
+                        'changed': counts['changed'], 'updated': layer.updated})
+    results = results[1:]
+
+    per_row = [result['seconds_per_row'] for result in results]
+    if max(per_row) > max_ratio * min(per_row):
+        raise AssertionError(f"Time per row grew from {min(per_row) * 1e6:.1f}us to {max(per_row) * 1e6:.1f}us; "
+                             f"the update phase is not linear in sheet size.")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 40000, 160000],
+                        help="Numbers of Smartsheet rows to generate.")
+    parser.add_argument("--max-ratio", type=float, default=2.0,
+                        help="Largest allowed growth in time per row across the sizes.")
+    args = parser.parse_args()
+
+    for result in run(load_script(), args.sizes, args.max_ratio):
+        print(f"{result['rows']} rows: {result['seconds']:.2f}s, {result['seconds_per_row'] * 1e6:.1f}us per row, "
+              f"{result['updated']} feature(s) written")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Benchmark the column-wise Smartsheet row conversion against the old per-cell conversion.
+
+Builds a synthetic sheet (100,000 rows by default) with real SDK column definitions, converts
+it both ways, checks the output is identical and prints the timings:
+
+    python benchmarks/benchmark_transform.py --rows 100000
+
+The sync script runs the whole sync when imported, so it is loaded here in a temp folder with
+stand-ins for arcpy and a Smartsheet client that finds no sheet.
+"""
+import argparse
+import atexit
+import contextlib
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import smartsheet
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "Smartsheet_to_AGOL_FeatureService_Append.py")
+
+# Column definitions as the Smartsheet API returns them, mapped to feature service fields.
+COLUMNS = [
+    {'id': 1, 'title': 'Parcel ID Number(s)', 'type': 'TEXT_NUMBER'},
+    {'id': 2, 'title': 'SMARTNAME', 'type': 'TEXT_NUMBER'},
+    {'id': 3, 'title': 'Inspection Date', 'type': 'DATETIME'},
+    {'id': 4, 'title': 'Modified', 'type': 'DATETIME', 'systemColumnType': 'MODIFIED_DATE'},
+    {'id': 5, 'title': 'Notes', 'type': 'TEXT_NUMBER'},
+    {'id': 6, 'title': 'Acres', 'type': 'TEXT_NUMBER'},
+    {'id': 7, 'title': 'Unmapped', 'type': 'TEXT_NUMBER'},
+]
+FIELD_MAPPING = {
+    'Row_ID': 'Row_ID', 'SMARTNAME': 'SMARTNAME', 'Parcel ID Number(s)': 'Parcel_ID_Numbers',
+    'Inspection Date': 'Inspection_Date', 'Modified': 'Modified', 'Notes': 'Notes', 'Acres': 'Acres',
+}
+
+
+def load_script():
+    """Import the sync script without running a sync and return the module."""
+    work_folder = tempfile.mkdtemp(prefix="smartsheet_benchmark_")
+    arcpy = sys.modules.setdefault("arcpy", mock.MagicMock(name="arcpy"))
+    arcpy.env.scratchGDB = work_folder
+    client = mock.MagicMock(name="smartsheet_client")
+    client.Sheets.list_sheets.return_value = mock.Mock(data=[], total_pages=1)
+
+    cwd = os.getcwd()
+    os.chdir(work_folder)
+    try:
+        with mock.patch.object(smartsheet, "Smartsheet", return_value=client), \
+                contextlib.redirect_stdout(open(os.devnull, 'w')):
+            spec = importlib.util.spec_from_file_location("smartsheet_sync_script", SCRIPT_PATH)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    atexit.unregister(module.write_run_report)
+    return module
+
+
+def make_rows(row_count, seed=0):
+    """Return synthetic rows shaped like SDK Row objects, with repeated and distinct values."""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    notes = ['Tree trim', 'Access denied', 'OK', 'Talked to owner', None, 'Re-inspect']
+    rows = []
+    for i in range(row_count):
+        timestamp = (base + timedelta(minutes=rng.randrange(500000))).strftime("%Y-%m-%dT%H:%M:%SZ")
+        values = {
+            1: f"{rng.randrange(10 ** 9):09d}",
+            2: f"SITE-{rng.randrange(5000)}",
+            3: (base + timedelta(days=rng.randrange(365))).strftime("%Y-%m-%dT00:00:00Z"),
+            4: timestamp,
+            5: rng.choice(notes),
+            # Equal values of different types (1, 1.0, True) must still convert differently.
+            6: rng.choice([0.5, 1.25, 12.0, 3, 1, 1.0, True, 0, 0.0, False]),
+            7: 'ignored',
+        }
+        cells = [SimpleNamespace(column_id=column_id, value=value) for column_id, value in values.items()]
+        rows.append(SimpleNamespace(id=4000000000000 + i, cells=cells))
+    return rows
+
+
+def legacy_transform(script, rows, columns):
+    """The per-cell conversion used before the column types were consulted.
+
+    format_date now caches the timezone lookup, so this understates the old per-cell cost.
+    """
+    col_id_to_title = {col.id: col.title for col in columns}
+    smartsheet_data = {}
+    for row in rows:
+        row_id = script.format_value(row.id)
+        row_data = {
+            script.row_id_field: row_id,
+            **{script.field_mapping.get(col_id_to_title[cell.column_id], col_id_to_title[cell.column_id]): script.format_date(cell.value) if isinstance(cell.value, str) and 'T' in cell.value else str(cell.value)
+               for cell in row.cells if col_id_to_title.get(cell.column_id) in script.field_mapping}
+        }
+        smartsheet_data[row_id] = row_data
+    return smartsheet_data
+
+
+def run(script, row_count):
+    """Time both conversions over row_count rows and return the timings in seconds."""
+    columns = [smartsheet.models.Column(column) for column in COLUMNS]
+    rows = make_rows(row_count)
+    with mock.patch.object(script, "field_mapping", FIELD_MAPPING):
+        start = time.perf_counter()
+        legacy = legacy_transform(script, rows, columns)
+        legacy_seconds = time.perf_counter() - start
+
+        script.get_timezone.cache_clear()
+        start = time.perf_counter()
+        converted = script.transform_rows(rows, script.build_column_converters(columns))
+        column_seconds = time.perf_counter() - start
+
+    if converted != legacy:
+        raise AssertionError("Column-wise conversion does not match the per-cell conversion.")
+    return {'rows': row_count, 'legacy_seconds': legacy_seconds, 'column_seconds': column_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="Number of synthetic rows.")
+    args = parser.parse_args()
+
+    result = run(load_script(), args.rows)
+    print(f"{result['rows']} rows: per-cell {result['legacy_seconds']:.2f}s, "
+          f"column-wise {result['column_seconds']:.2f}s "
+          f"({result['legacy_seconds'] / max(result['column_seconds'], 1e-9):.1f}x), output identical")
+
+
+if __name__ == "__main__":
+    main()
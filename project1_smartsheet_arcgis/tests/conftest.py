@@ -0,0 +1,44 @@
+"""Load the Smartsheet sync script for testing, with stand-ins for arcpy and the Smartsheet client.
+
+The script runs the whole sync when it is imported. It is loaded in an empty working folder with a
+client that finds no sheet, so only its setup runs and its functions can be tested on their own.
+"""
+import atexit
+import importlib.util
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "Smartsheet_to_AGOL_FeatureService_Append.py")
+
+
+def load_script(work_folder, module_name="smartsheet_sync_script"):
+    """Import the script in work_folder with a Smartsheet client that finds no sheet."""
+    import smartsheet
+
+    client = mock.MagicMock(name="smartsheet_client")
+    client.Sheets.list_sheets.return_value = mock.Mock(data=[], total_pages=1)
+
+    cwd = os.getcwd()
+    os.chdir(work_folder)
+    try:
+        with mock.patch.object(smartsheet, "Smartsheet", return_value=client):
+            spec = importlib.util.spec_from_file_location(module_name, SCRIPT_PATH)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    atexit.unregister(module.write_run_report)
+    return module
+
+
+@pytest.fixture(scope="session")
+def sync_script(tmp_path_factory):
+    """Return the imported script module."""
+    work_folder = tmp_path_factory.mktemp("sync_script")
+    arcpy = sys.modules.setdefault("arcpy", mock.MagicMock(name="arcpy"))
+    arcpy.env.scratchGDB = str(work_folder)
+    return load_script(work_folder)
@@ -0,0 +1,131 @@
+"""REST feature updates against a local stand-in for a hosted feature layer."""
+import http.server
+import json
+import re
+import sys
+import threading
+import urllib.parse
+from datetime import datetime
+from unittest import mock
+
+import pytest
+
+import conftest
+
+FIELDS = [
+    {'name': 'OBJECTID', 'type': 'esriFieldTypeOID'},
+    {'name': 'Parcel_ID', 'type': 'esriFieldTypeString'},
+    {'name': 'Parcel_ID_Numbers', 'type': 'esriFieldTypeString'},
+    {'name': 'Code', 'type': 'esriFieldTypeString'},
+    {'name': 'Inspection_Date', 'type': 'esriFieldTypeDate'},
+]
+MARCH_5_2PM = 1709649000000  # 2024-03-05 14:30 as epoch milliseconds.
+
+
+class FeatureLayerHandler(http.server.BaseHTTPRequestHandler):
+    """Answers query and applyEdits like a hosted feature layer and records every edit batch."""
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        form = {key: values[0] for key, values in urllib.parse.parse_qs(self.rfile.read(length).decode()).items()}
+        endpoint = self.path.rsplit('/', 1)[-1]
+        self.server.requests.append((endpoint, form))
+        if endpoint == '0':
+            result = {'objectIdField': 'OBJECTID', 'fields': FIELDS}
+        elif endpoint == 'query':
+            wanted = set(re.findall(r"'([^']*)'", form['where']))
+            fields = form['outFields'].split(',')
+            features = [{'attributes': {field: feature[field] for field in ['OBJECTID'] + fields}}
+                        for feature in self.server.features.values() if feature['Parcel_ID'] in wanted]
+            result = {'objectIdFieldName': 'OBJECTID', 'features': features}
+        else:
+            updates = json.loads(form.get('updates', '[]'))
+            self.server.batches.append(updates)
+            for update in updates:
+                self.server.features[update['attributes']['OBJECTID']].update(update['attributes'])
+            result = {'addResults': [], 'updateResults': [
+                {'objectId': update['attributes']['OBJECTID'], 'success': True} for update in updates]}
+        body = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feature_layer():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FeatureLayerHandler)
+    server.batches = []
+    server.requests = []
+    server.features = {
+        oid: {'OBJECTID': oid, 'Parcel_ID': f'P-{oid}', 'Parcel_ID_Numbers': f'P-{oid}',
+              'Code': code, 'Inspection_Date': MARCH_5_2PM}
+        for oid, code in [(1, '007'), (2, 'A'), (3, 'B')]
+    }
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/FeatureServer/0'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_rest_sync_sends_only_changed_fields(sync_script, feature_layer, monkeypatch):
+    field_mapping = {'Parcel ID Number(s)': 'Parcel_ID_Numbers', 'Code': 'Code', 'Inspection Date': 'Inspection_Date'}
+    monkeypatch.setattr(sync_script, 'field_mapping', field_mapping)
+    smartsheet_data = {
+        # Unchanged: the date matches the stored epoch value once both are read as dates.
+        '11': {'Parcel_ID_Numbers': 'P-2', 'Code': 'A', 'Inspection_Date': '03/05/24 02:30 PM'},
+        # Text field: "7" is not "007".
+        '12': {'Parcel_ID_Numbers': 'P-1', 'Code': '7', 'Inspection_Date': '03/05/24 02:30 PM'},
+        # Date field changed.
+        '13': {'Parcel_ID_Numbers': 'P-3', 'Code': 'B', 'Inspection_Date': '03/06/24 09:00 AM'},
+    }
+
+    writer = sync_script.ApplyEditsWriter(feature_layer.url, batch_size=1, max_workers=1)
+    counts = sync_script.append_to_feature_service(None, smartsheet_data, field_mapping, edit_writer=writer)
+    results = writer.close()
+
+    assert counts == {'changed': 2, 'unchanged': 1, 'missing': 0}
+    assert results['updated'] == 2 and results['failed_batches'] == 0
+    sent = sorted((update['attributes'] for batch in feature_layer.batches for update in batch),
+                  key=lambda attributes: attributes['OBJECTID'])
+    assert sent == [
+        {'OBJECTID': 1, 'Code': '7'},
+        {'OBJECTID': 3, 'Inspection_Date': 1709715600000},
+    ]
+    assert all(len(batch) == 1 for batch in feature_layer.batches)
+    assert results['requests'] == len(feature_layer.requests)
+
+
+def test_query_pages_are_ordered_by_object_id(sync_script, feature_layer):
+    writer = sync_script.ApplyEditsWriter(feature_layer.url)
+
+    list(writer.query_rows("Parcel_ID IN ('P-1', 'P-2')", ['Parcel_ID']))
+    writer.close()
+
+    [(info_endpoint, _), (query_endpoint, query)] = feature_layer.requests
+    assert (info_endpoint, query_endpoint) == ('0', 'query')
+    assert query['orderByFields'] == 'OBJECTID'
+
+
+def test_query_rows_returns_dates_as_datetimes(sync_script, feature_layer):
+    writer = sync_script.ApplyEditsWriter(feature_layer.url)
+
+    rows = list(writer.query_rows("Parcel_ID IN ('P-1')", ['Parcel_ID', 'Inspection_Date']))
+    writer.close()
+
+    assert rows == [(1, ['P-1', datetime(2024, 3, 5, 14, 30)])]
+
+
+
+def test_script_runs_without_arcpy(tmp_path):
+    with mock.patch.dict(sys.modules, {"arcpy": None}):
+        module = conftest.load_script(tmp_path, "smartsheet_sync_without_arcpy")
+
+    assert module.arcpy is None
+    assert module.ApplyEditsWriter.__module__ == "apply_edits_writer"
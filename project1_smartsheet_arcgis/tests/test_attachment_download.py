@@ -0,0 +1,202 @@
+"""Attachment downloads against a local HTTP stand-in for the Smartsheet file host."""
+import http.server
+import json
+import os
+import threading
+from unittest import mock
+
+import pytest
+
+CONTENT = bytes(range(256)) * 40
+
+
+class FileHostHandler(http.server.BaseHTTPRequestHandler):
+    """Serves CONTENT, honours Range requests and answers 429 while the server is throttling."""
+
+    def do_GET(self):
+        self.server.requests.append({'path': self.path, 'range': self.headers.get('Range')})
+        if self.server.throttle:
+            self.server.throttle -= 1
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        content = self.server.content
+        requested = self.headers.get('Range')
+        if requested:
+            start = int(requested.split('=', 1)[1].rstrip('-'))
+            if start >= len(content):
+                self.send_response(416)
+                if self.server.report_size:
+                    self.send_header('Content-Range', f'bytes */{len(content)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = content[start:]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(content) - 1}/{len(content)}')
+        else:
+            body = content
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def file_host():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FileHostHandler)
+    server.requests = []
+    server.throttle = 0
+    server.content = CONTENT
+    server.report_size = True
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/attachment'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_with_retry_backs_off_on_429(sync_script, file_host):
+    file_host.throttle = 2
+
+    with sync_script.get_with_retry(file_host.url) as response:
+        assert response.status_code == 200
+        assert response.content == CONTENT
+    assert len(file_host.requests) == 3
+
+
+def test_get_with_retry_gives_up_after_max_retries(sync_script, file_host, monkeypatch):
+    monkeypatch.setattr(sync_script, 'max_download_retries', 2)
+    file_host.throttle = 5
+
+    with sync_script.get_with_retry(file_host.url) as response:
+        assert response.status_code == 429
+    assert len(file_host.requests) == 2
+
+
+def test_download_to_partial_fetches_whole_file(sync_script, file_host, tmp_path):
+    partial_path = tmp_path / 'file.part'
+
+    sync_script.download_to_partial(file_host.url, str(partial_path))
+
+    assert partial_path.read_bytes() == CONTENT
+    assert file_host.requests[0]['range'] is None
+
+
+def test_download_to_partial_resumes_with_range(sync_script, file_host, tmp_path):
+    partial_path = tmp_path / 'file.part'
+    partial_path.write_bytes(CONTENT[:1000])
+
+    sync_script.download_to_partial(file_host.url, str(partial_path))
+
+    assert partial_path.read_bytes() == CONTENT
+    assert file_host.requests[0]['range'] == 'bytes=1000-'
+
+
+def test_download_to_partial_accepts_complete_partial(sync_script, file_host, tmp_path):
+    partial_path = tmp_path / 'file.part'
+    partial_path.write_bytes(CONTENT)
+
+    sync_script.download_to_partial(file_host.url, str(partial_path))
+
+    assert partial_path.read_bytes() == CONTENT
+    assert file_host.requests[0]['range'] == f'bytes={len(CONTENT)}-'
+
+
+def test_download_to_partial_discards_oversized_partial(sync_script, file_host, tmp_path):
+    partial_path = tmp_path / 'file.part'
+    partial_path.write_bytes(CONTENT + b'extra')
+
+    with pytest.raises(IOError):
+        sync_script.download_to_partial(file_host.url, str(partial_path))
+    assert not partial_path.exists()
+
+
+@pytest.fixture
+def attachment_store(sync_script, file_host, monkeypatch, tmp_path):
+    """Point the attachment store at a temp folder and the client at the stand-in host."""
+    store_folder = tmp_path / '_attachment_store'
+    partial_folder = store_folder / 'partial'
+    partial_folder.mkdir(parents=True)
+    monkeypatch.setattr(sync_script, 'attachment_store_folder', str(store_folder))
+    monkeypatch.setattr(sync_script, 'partial_download_folder', str(partial_folder))
+    monkeypatch.setattr(sync_script, 'attachment_index', {})
+    monkeypatch.setitem(sync_script.run_report, 'counters', {})
+    client = mock.MagicMock(name='smartsheet_client')
+    client.Attachments.get_attachment.return_value = mock.Mock(url=file_host.url)
+    monkeypatch.setattr(sync_script, 'smartsheet_client', client)
+    row_folder = tmp_path / 'Row_1'
+    row_folder.mkdir()
+    return row_folder
+
+
+def download(sync_script, row_folder):
+    attachment = mock.Mock(id=77, size_in_kb=len(CONTENT) // 1024)
+    attachment.name = 'photo.jpg'
+    sync_script.download_attachment(attachment, str(row_folder), sheet_id=1)
+    return row_folder / 'photo.jpg'
+
+
+def test_legacy_file_is_downloaded_again_in_full(sync_script, file_host, attachment_store):
+    # An older version of the attachment with the same name, left by the old script.
+    (attachment_store / 'photo.jpg').write_bytes(b'old version of the photo')
+
+    local_file = download(sync_script, attachment_store)
+
+    assert local_file.read_bytes() == CONTENT
+    assert [request['range'] for request in file_host.requests] == [None]
+    assert sync_script.get_download_counts()['downloaded'] == 1
+
+
+def test_complete_legacy_file_is_replaced_by_the_stored_copy(sync_script, file_host, attachment_store):
+    (attachment_store / 'photo.jpg').write_bytes(CONTENT)
+
+    local_file = download(sync_script, attachment_store)
+
+    stored_file = sync_script.store_path(sync_script.attachment_index['77']['hash'])
+    assert local_file.read_bytes() == CONTENT
+    assert os.path.samefile(local_file, stored_file)
+    assert os.listdir(sync_script.partial_download_folder) == []
+
+
+def test_own_partial_download_is_resumed(sync_script, file_host, attachment_store):
+    partial_path = os.path.join(sync_script.partial_download_folder, '77.part')
+    with open(partial_path, 'wb') as partial_file:
+        partial_file.write(CONTENT[:1000])
+
+    local_file = download(sync_script, attachment_store)
+
+    assert local_file.read_bytes() == CONTENT
+    assert [request['range'] for request in file_host.requests] == ['bytes=1000-']
+    assert not os.path.exists(partial_path)
+
+
+def test_complete_partial_is_downloaded_again_when_size_is_unknown(sync_script, file_host, attachment_store):
+    file_host.report_size = False
+    with open(os.path.join(sync_script.partial_download_folder, '77.part'), 'wb') as partial_file:
+        partial_file.write(CONTENT)
+
+    local_file = download(sync_script, attachment_store)
+
+    assert local_file.read_bytes() == CONTENT
+    assert [request['range'] for request in file_host.requests] == [f'bytes={len(CONTENT)}-', None]
+    assert sync_script.get_download_counts()['downloaded'] == 1
+
+
+def test_download_counters_are_in_the_run_report(sync_script, file_host, attachment_store, monkeypatch, tmp_path):
+    monkeypatch.setattr(sync_script, 'run_report_file', str(tmp_path / 'run_report.json'))
+
+    download(sync_script, attachment_store)
+    sync_script.write_run_report()
+
+    with open(tmp_path / 'run_report.json') as report_file:
+        counters = json.load(report_file)['counters']
+    assert counters['attachments_downloaded'] == 1
+    assert counters['attachment_bytes_downloaded'] == len(CONTENT)
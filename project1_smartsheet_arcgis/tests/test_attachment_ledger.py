@@ -0,0 +1,40 @@
+"""The SQLite attachment ledger and its pending uploads."""
+import pytest
+
+
+@pytest.fixture
+def ledger(sync_script, monkeypatch, tmp_path):
+    monkeypatch.setattr(sync_script, 'ledger_file', str(tmp_path / 'uploaded_attachments.db'))
+    monkeypatch.setattr(sync_script, 'log_file', str(tmp_path / 'uploaded_attachments_log.xlsx'))
+    connection = sync_script.open_attachment_ledger()
+    yield connection
+    connection.close()
+
+
+def test_uploaded_attachments_are_not_queued_again(sync_script, ledger):
+    sync_script.log_uploaded_attachments(ledger, [('1', 'a.jpg', 'hash-a')])
+
+    sync_script.queue_pending_uploads(ledger, [('1', 'a.jpg', '/tmp/a.jpg'), ('2', 'b.jpg', '/tmp/b.jpg')])
+
+    assert sync_script.get_pending_uploads(ledger) == [('2', 'b.jpg', '/tmp/b.jpg')]
+
+
+def test_dropped_pending_uploads_are_removed(sync_script, ledger):
+    files = [('1', 'a.jpg', '/tmp/a.jpg'), ('2', 'b.jpg', '/tmp/b.jpg'), ('3', 'c.jpg', '/tmp/c.jpg')]
+    sync_script.queue_pending_uploads(ledger, files)
+
+    sync_script.drop_pending_uploads(ledger, files[:2])
+
+    assert sync_script.get_pending_uploads(ledger) == [('3', 'c.jpg', '/tmp/c.jpg')]
+
+
+def test_planned_uploads_read_the_ledger_without_changing_it(sync_script, ledger, capsys):
+    sync_script.log_uploaded_attachments(ledger, [('1', 'a.jpg', 'hash-a')])
+    sync_script.queue_pending_uploads(ledger, [('3', 'c.jpg', '/tmp/c.jpg')])
+    ledger.commit()
+
+    planned = sync_script.print_planned_uploads([('1', 'a.jpg', '/tmp/a.jpg'), ('2', 'b.jpg', '/tmp/b.jpg')])
+
+    assert planned == [('2', 'b.jpg', '/tmp/b.jpg'), ('3', 'c.jpg', '/tmp/c.jpg')]
+    assert "2 attachment(s) would be uploaded" in capsys.readouterr().out
+    assert sync_script.get_pending_uploads(ledger) == [('3', 'c.jpg', '/tmp/c.jpg')]
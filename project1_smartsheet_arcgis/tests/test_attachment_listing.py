@@ -0,0 +1,84 @@
+"""Attachment listing for the synced rows against a fake Smartsheet client."""
+from unittest import mock
+
+import pytest
+import smartsheet
+
+
+def index_result(items, page, page_size, model):
+    start = (page - 1) * page_size
+    total_pages = max((len(items) + page_size - 1) // page_size, 1)
+    return mock.Mock(data=[model(item) for item in items[start:start + page_size]], total_pages=total_pages)
+
+
+class FakeClient:
+    """Pages row, discussion and sheet-level attachment listings from memory and records each call."""
+
+    def __init__(self, attachments, discussions):
+        self.calls = []
+        self.Attachments = mock.Mock()
+        self.Discussions = mock.Mock()
+
+        def list_all_attachments(sheet_id, page_size=None, page=None):
+            self.calls.append(('sheet', page))
+            return index_result(attachments, page, page_size, smartsheet.models.Attachment)
+
+        # Row of each discussion and comment, for the attachments list_row_attachments includes.
+        discussion_rows = {}
+        for discussion in discussions:
+            discussion_rows[discussion['id']] = discussion['parentId']
+            discussion_rows.update((comment['id'], discussion['parentId']) for comment in discussion['comments'])
+
+        def list_row_attachments(sheet_id, row_id, page_size=None, page=None):
+            self.calls.append(('row', row_id, page))
+            on_row = [attachment for attachment in attachments if row_id == (
+                attachment['parentId'] if attachment['parentType'] == 'ROW'
+                else discussion_rows.get(attachment['parentId']))]
+            return index_result(on_row, page, page_size, smartsheet.models.Attachment)
+
+        def get_all_discussions(sheet_id, include=None, page_size=None, page=None):
+            self.calls.append(('discussions', page))
+            return index_result(discussions, page, page_size, smartsheet.models.Discussion)
+
+        self.Attachments.list_all_attachments.side_effect = list_all_attachments
+        self.Attachments.list_row_attachments.side_effect = list_row_attachments
+        self.Discussions.get_all_discussions.side_effect = get_all_discussions
+
+
+ATTACHMENTS = [
+    {'id': 1, 'name': 'row1.jpg', 'parentType': 'ROW', 'parentId': 101},
+    {'id': 2, 'name': 'row2.jpg', 'parentType': 'ROW', 'parentId': 102},
+    {'id': 3, 'name': 'discussion.pdf', 'parentType': 'DISCUSSION', 'parentId': 900},
+    {'id': 4, 'name': 'comment.pdf', 'parentType': 'COMMENT', 'parentId': 901},
+    {'id': 5, 'name': 'sheet.pdf', 'parentType': 'SHEET', 'parentId': 1},
+    {'id': 6, 'name': 'row3.jpg', 'parentType': 'ROW', 'parentId': 103},
+]
+DISCUSSIONS = [{'id': 900, 'parentType': 'ROW', 'parentId': 101, 'comments': [{'id': 901}]}]
+
+
+@pytest.fixture
+def client(sync_script, monkeypatch):
+    fake = FakeClient(ATTACHMENTS, DISCUSSIONS)
+    monkeypatch.setattr(sync_script, 'smartsheet_client', fake)
+    monkeypatch.setattr(sync_script, 'attachment_listing_page_size', 2)
+    monkeypatch.setitem(sync_script.run_report, 'counters', {})
+    return fake
+
+
+def listed(sync_script, row_ids):
+    return sorted((row_id, attachment.name) for row_id, attachment in sync_script.iter_row_attachments(1, row_ids))
+
+
+def test_small_sync_lists_only_its_rows(sync_script, client):
+    assert listed(sync_script, {101}) == [(101, 'comment.pdf'), (101, 'discussion.pdf'), (101, 'row1.jpg')]
+    assert all(call[0] == 'row' for call in client.calls)
+    assert sync_script.get_download_counts()['listed'] == 3
+
+
+def test_large_sync_pages_the_sheet_listing_and_keeps_discussion_attachments(sync_script, client, monkeypatch):
+    monkeypatch.setattr(sync_script, 'per_row_listing_limit', 1)
+
+    assert listed(sync_script, {101, 102}) == [(101, 'comment.pdf'), (101, 'discussion.pdf'), (101, 'row1.jpg'),
+                                               (102, 'row2.jpg')]
+    assert [call for call in client.calls if call[0] == 'sheet'] == [('sheet', 1), ('sheet', 2), ('sheet', 3)]
+    assert not any(call[0] == 'row' for call in client.calls)
@@ -0,0 +1,50 @@
+"""Field-aware comparison of feature service rows with Smartsheet records."""
+from datetime import datetime
+
+
+def test_field_kind_reads_arcpy_and_rest_type_names(sync_script):
+    assert sync_script.field_kind('Double') == 'numeric'
+    assert sync_script.field_kind('esriFieldTypeInteger') == 'numeric'
+    assert sync_script.field_kind('Date') == 'date'
+    assert sync_script.field_kind('esriFieldTypeDate') == 'date'
+    assert sync_script.field_kind('String') == 'text'
+    assert sync_script.field_kind('esriFieldTypeString') == 'text'
+
+
+def test_text_fields_keep_leading_zeros_and_long_ids(sync_script):
+    normalize = sync_script.normalize_for_diff
+
+    assert normalize('007') != normalize('7')
+    assert normalize('12345678901234567890') != normalize('12345678901234567891')
+    assert normalize(' Tree trim ') == normalize('Tree trim')
+    assert normalize('') is None and normalize('None') is None
+
+
+def test_numeric_fields_compare_as_numbers(sync_script):
+    normalize = sync_script.normalize_for_diff
+
+    assert normalize('007', 'numeric') == normalize(7, 'numeric')
+    assert normalize('3.0', 'numeric') == normalize(3, 'numeric')
+    assert normalize('0.3', 'numeric') == normalize(0.1 + 0.2, 'numeric')
+    assert normalize('12345678901234567891', 'numeric') == normalize(12345678901234567891, 'numeric')
+    assert normalize('12345678901234567891', 'numeric') != normalize('12345678901234567890', 'numeric')
+    assert normalize('n/a', 'numeric') == 'n/a'
+
+
+def test_date_fields_compare_across_formats(sync_script):
+    normalize = sync_script.normalize_for_diff
+    stored = datetime(2024, 3, 5, 14, 30)
+
+    assert normalize(stored, 'date') == normalize('03/05/24 02:30 PM', 'date')
+    assert normalize('2024-03-05T14:30:00', 'date') == normalize(stored, 'date')
+
+
+def test_diff_row_uses_field_kinds(sync_script, monkeypatch):
+    monkeypatch.setattr(sync_script, 'field_mapping', {'Code': 'Code', 'Count': 'Count'})
+    update_fields = ['Code', 'Count']
+    row = ['P-1', '007', 4]
+    record = {'Code': '7', 'Count': '4.0'}
+
+    changes = sync_script.diff_row(row, record, update_fields, {'Code': 'text', 'Count': 'numeric'})
+
+    assert [field for _, field, _, _ in changes] == ['Code']
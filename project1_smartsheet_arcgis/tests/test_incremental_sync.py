@@ -0,0 +1,139 @@
+"""Incremental sync against a local fake Smartsheet client."""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+import smartsheet
+
+SHEET_ID = 1001
+
+
+class FakeSheets:
+    """Serves a sheet from memory the way Sheets.get_sheet pages and filters it."""
+
+    def __init__(self, rows, version=7):
+        self.rows = rows
+        self.version = version
+        self.calls = []
+        self.after_page = None
+
+    def get_sheet_version(self, sheet_id):
+        return SimpleNamespace(version=self.version)
+
+    def get_sheet(self, sheet_id, page_size=None, page=None, rows_modified_since=None):
+        self.calls.append({"page_size": page_size, "page": page, "rows_modified_since": rows_modified_since})
+        rows = self.rows
+        if rows_modified_since is not None:
+            # The live API only accepts ISO 8601 text here.
+            assert isinstance(rows_modified_since, str)
+            since = datetime.fromisoformat(rows_modified_since)
+            rows = [row for row in rows if datetime.fromisoformat(row["modifiedAt"].replace("Z", "+00:00")) > since]
+        start = (page - 1) * page_size
+        sheet = smartsheet.models.Sheet({
+            "id": sheet_id,
+            "version": self.version,
+            "modifiedAt": max(row["modifiedAt"] for row in self.rows),
+            "totalRowCount": len(rows),
+            "columns": [{"id": 1, "title": "Parcel ID Number(s)", "type": "TEXT_NUMBER"}],
+            "rows": rows[start:start + page_size],
+        })
+        if self.after_page:
+            self.after_page(page)
+        return sheet
+
+
+class FakeClient:
+    def __init__(self, rows):
+        self.Sheets = FakeSheets(rows)
+
+
+def make_rows(count, base=datetime(2024, 1, 1, tzinfo=timezone.utc)):
+    return [{
+        "id": 5000 + i,
+        "modifiedAt": (base + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "cells": [{"columnId": 1, "value": f"P-{i}"}],
+    } for i in range(count)]
+
+
+def test_full_sync_pages_through_every_row(sync_script, monkeypatch):
+    monkeypatch.setattr(sync_script, "sheet_page_size", 4)
+    client = FakeClient(make_rows(10))
+
+    pages = list(sync_script.iter_sheet_pages(client, SHEET_ID))
+
+    assert [len(page.rows) for page in pages] == [4, 4, 2]
+    assert all(call["rows_modified_since"] is None for call in client.Sheets.calls)
+
+
+def test_incremental_sync_sends_iso_watermark_and_gets_changed_rows(sync_script, monkeypatch):
+    monkeypatch.setattr(sync_script, "sheet_page_size", 4)
+    client = FakeClient(make_rows(10))
+    watermark = datetime(2024, 1, 1, 6, tzinfo=timezone.utc)
+
+    pages = list(sync_script.iter_sheet_pages(client, SHEET_ID, watermark))
+
+    assert client.Sheets.calls[0]["rows_modified_since"] == "2024-01-01T06:00:00+00:00"
+    assert [row.id for page in pages for row in page.rows] == [5007, 5008, 5009]
+
+
+def test_sync_state_round_trip(sync_script, monkeypatch, tmp_path):
+    monkeypatch.setattr(sync_script, "sync_state_file", str(tmp_path / "state.json"))
+    monkeypatch.setattr(sync_script, "incremental_sync", True)
+    monkeypatch.setattr(sync_script, "force_full_resync", False)
+    assert sync_script.get_sync_start(SHEET_ID) is None
+
+    watermark = datetime(2024, 1, 1, 9, tzinfo=timezone.utc)
+    sync_script.save_sync_state(SHEET_ID, 7, watermark)
+
+    assert sync_script.get_sync_start(SHEET_ID) == watermark
+    assert sync_script.get_sync_start(SHEET_ID + 1) is None
+    monkeypatch.setattr(sync_script, "force_full_resync", True)
+    assert sync_script.get_sync_start(SHEET_ID) is None
+
+
+@pytest.fixture
+def incremental_state(sync_script, monkeypatch, tmp_path):
+    monkeypatch.setattr(sync_script, "sync_state_file", str(tmp_path / "state.json"))
+    monkeypatch.setattr(sync_script, "incremental_sync", True)
+    monkeypatch.setattr(sync_script, "force_full_resync", False)
+
+
+def sync(sync_script, client, since):
+    """Fetch every page like the main loop does and return the rows and the watermark to save."""
+    rows, watermark = [], None
+    fetch_started = datetime.now(timezone.utc) - sync_script.sync_overlap
+    for page in sync_script.iter_sheet_pages(client, SHEET_ID, since):
+        watermark = watermark or sync_script.next_sync_watermark(page, fetch_started)
+        rows += page.rows
+    return rows, watermark
+
+
+def test_row_edited_during_the_sync_is_fetched_next_time(sync_script, monkeypatch, incremental_state):
+    monkeypatch.setattr(sync_script, "sheet_page_size", 2)
+    client = FakeClient(make_rows(4))
+
+    def edit_first_row_and_add_a_newer_row(page):
+        # After page 1 is served, row 5000 is edited and a newer row is added that page 2 returns.
+        if page == 1:
+            client.Sheets.rows[0]["modifiedAt"] = "2024-01-01T10:00:00Z"
+            client.Sheets.rows.append(make_rows(1, base=datetime(2024, 1, 1, 11, tzinfo=timezone.utc))[0])
+
+    client.Sheets.after_page = edit_first_row_and_add_a_newer_row
+    _, watermark = sync(sync_script, client, None)
+    sync_script.save_sync_state(SHEET_ID, 7, watermark)
+    client.Sheets.after_page = None
+
+    changed, _ = sync(sync_script, client, sync_script.get_sync_start(SHEET_ID))
+
+    assert 5000 in [row.id for row in changed]
+
+
+def test_unchanged_sheet_version_skips_the_run(sync_script, incremental_state):
+    client = FakeClient(make_rows(3))
+    assert not sync_script.is_sheet_unchanged(client, SHEET_ID)
+
+    sync_script.save_sync_state(SHEET_ID, 7, datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    assert sync_script.is_sheet_unchanged(client, SHEET_ID)
+    client.Sheets.version = 8
+    assert not sync_script.is_sheet_unchanged(client, SHEET_ID)
@@ -0,0 +1,43 @@
+"""The Parcel ID index used by the feature update, and its scaling with sheet size."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import benchmark_parcel_index  # noqa: E402
+
+
+def test_split_parcel_ids_handles_multi_valued_cells(sync_script):
+    assert sync_script.split_parcel_ids("APN-1, APN-2;APN-3\nAPN-4") == ["APN-1", "APN-2", "APN-3", "APN-4"]
+    assert sync_script.split_parcel_ids(" APN-1 ,, N/A; ") == ["APN-1"]
+    assert sync_script.split_parcel_ids("N/A") == []
+    assert sync_script.split_parcel_ids(None) == []
+    assert sync_script.split_parcel_ids("34°03'12.34\"N, 118°14'33.21\"W") == []
+
+
+def test_build_parcel_index_keeps_the_first_row_for_duplicates(sync_script):
+    first = {'Parcel_ID_Numbers': 'APN-1, APN-2'}
+    second = {'Parcel_ID_Numbers': 'APN-2; APN-3'}
+    third = {'Parcel_ID_Numbers': 'APN-1'}
+
+    index = sync_script.build_parcel_index({'1': first, '2': second, '3': third})
+
+    assert index == {'APN-1': first, 'APN-2': first, 'APN-3': second}
+
+
+def test_build_parcel_index_skips_ids_claimed_by_earlier_pages(sync_script):
+    claimed = set()
+    first_page = sync_script.build_parcel_index({'1': {'Parcel_ID_Numbers': 'APN-1, APN-2'}}, claimed_parcel_ids=claimed)
+    second_page = sync_script.build_parcel_index({'2': {'Parcel_ID_Numbers': 'APN-2, APN-3'}},
+                                                 claimed_parcel_ids=claimed)
+
+    assert list(first_page) == ['APN-1', 'APN-2']
+    assert list(second_page) == ['APN-3']
+    assert claimed == {'APN-1', 'APN-2', 'APN-3'}
+
+
+def test_feature_update_time_per_row_stays_flat(sync_script):
+    # run() raises if the time per row grows with the sheet; a per-row scan of the sheet would grow 8x here.
+    results = benchmark_parcel_index.run(sync_script, [2000, 16000], max_ratio=3.0)
+
+    assert [result['rows'] for result in results] == [2000, 16000]
+    assert all(result['updated'] == result['changed'] > 0 for result in results)
@@ -0,0 +1,39 @@
+"""Column-wise Smartsheet conversion with real SDK column definitions."""
+import os
+import sys
+from types import SimpleNamespace
+
+import smartsheet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import benchmark_transform  # noqa: E402
+
+
+def test_build_column_converters_reads_sdk_column_types(sync_script, monkeypatch):
+    monkeypatch.setattr(sync_script, "field_mapping", benchmark_transform.FIELD_MAPPING)
+    columns = [smartsheet.models.Column(column) for column in benchmark_transform.COLUMNS]
+
+    converters = sync_script.build_column_converters(columns)
+
+    assert converters[3][1] is sync_script.convert_datetime_cell
+    assert converters[4][1] is sync_script.convert_datetime_cell
+    assert converters[5] == ('Notes', str)
+    assert 7 not in converters
+
+
+def test_transform_rows_matches_per_cell_conversion(sync_script):
+    # run() raises if the two conversions disagree on any row.
+    result = benchmark_transform.run(sync_script, 2000)
+
+    assert result['rows'] == 2000
+
+
+def test_equal_values_of_different_types_convert_separately(sync_script, monkeypatch):
+    monkeypatch.setattr(sync_script, "field_mapping", benchmark_transform.FIELD_MAPPING)
+    converters = sync_script.build_column_converters([smartsheet.models.Column(benchmark_transform.COLUMNS[5])])
+    rows = [SimpleNamespace(id=i, cells=[SimpleNamespace(column_id=6, value=value)])
+            for i, value in enumerate([1, True, 1.0, 0, False, 0.0])]
+
+    records = sync_script.transform_rows(rows, converters)
+
+    assert [record['Acres'] for record in records.values()] == ['1', 'True', '1.0', '0', 'False', '0.0']
@@ -1,4 +1,18 @@
 import os
+import json
+import time
+import getpass
+import uuid
+import smtplib
+import argparse
+import hashlib
+import threading
+import mimetypes
+import subprocess
+import tracemalloc
+import contextlib
+import concurrent.futures
+from email.message import EmailMessage
 import arcpy
 import pandas as pd
 import numpy as np
@@ -30,9 +44,18 @@ yesterday_max = today_max - timedelta(days=1)
 yesterday_df_max = yesterday_max.strftime('%m/%d/%Y %H:%M')
 print("The ending query time is: ", yesterday_df_max)
 
+# Submission window sent to the feature service: from midnight yesterday up to (not including) midnight today
+query_start = yesterday_min
+query_end = today_min
+
 YYYYMMDD = dt.strftime('%Y%m%d_')  # Format for CSV naming
 print("The file date format is: ", YYYYMMDD)
 
+# The sub-consultants reported (and those that failed) on each day are recorded here, so a scheduled
+# run can catch up on missed days and rerun only the reports that failed
+completed_days_path = r"C:\REPLACE_WITH_PATH\SubConsultantReports\completed_days.json"
+max_catch_up_days = 14
+
 # Mapping for columns in CSVs
 column_mapping = {
     'EndDate': 'Date Form Submitted',
@@ -45,43 +68,179 @@ column_mapping = {
     'ERM_Begin_Survey': 'Accessed?'
 }
 
+# Limits for a single "IN (...)" where clause sent to the feature service
+max_in_clause_values = 500
+max_where_clause_length = 8000
+
 # Path to the Master Tracker Excel file
-userName = os.getlogin()
+userName = getpass.getuser()
 masterTrackerXlPath = os.path.join(r"C:\Users", userName, r"Documents\ERM\REPLACE_WITH_PROJECT\Master_Tracker.xlsx")
 
-# Load the Master Tracker sheet
-dfm = pd.read_excel(masterTrackerXlPath, sheet_name="MAT", dtype={
-    "Work Order ID": str,
-    "NBS": str,
-    "Field Survey": str,
-    "Plant Survey": str,
-    "Bio Mon Phase": str,
-    "Waters Mon Phase": str,
-    "Arch Mon/Survey Phase": str
-})
-dfm['Date submitted (DO NOT EDIT CELLS)'] = pd.to_datetime(
-    dfm['Date submitted (DO NOT EDIT CELLS)'], format='%Y%m%d'
-).dt.strftime('%m/%d/%Y %H:%M')
-
-
-def GetDfFromFC(vm_layer, company_name) -> pd.DataFrame:
-    """Convert a feature class table to a pandas DataFrame."""
+# Report output per sub-consultant: "xlsx" (emailed), "csv" or "parquet" (one file per sheet, not emailed)
+# and an optional folder overriding the output folder. Sub-consultants not listed get the default.
+default_report_output = {"format": "xlsx", "folder": None}
+report_output_settings = {
+    # "SUB_CONSULTANT_NAME": {"format": "parquet", "folder": r"C:\REPLACE_WITH_PATH\Downstream"},
+}
+
+# Outgoing email: SMTP first, then the legacy .vbs script as a fallback. Messages wait in the outbox
+# folder until sent, so mail that could not be sent is retried by the next run.
+smtp_host = "smtp.REPLACE_WITH_DOMAIN.com"
+smtp_port = 587
+smtp_user = os.environ.get("DAILY_EMAILER_SMTP_USER")
+smtp_password = os.environ.get("DAILY_EMAILER_SMTP_PASSWORD")
+email_sender = "REPLACE_WITH_SENDER@domain.com"
+email_script_path = r"C:\REPLACE_WITH_PATH\send_email_script.vbs"
+email_outbox_folder = r"C:\REPLACE_WITH_PATH\SubConsultantReports\outbox"
+email_max_attempts = 4
+email_retry_delay = 5  # seconds, doubled after each failed attempt
+email_workers = 4
+
+# Columns of the Master Tracker sheet used by the invoicing merge
+master_tracker_columns = [
+    "Work Order ID", "NBS", "Field Survey", "Plant Survey",
+    "Bio Mon Phase", "Waters Mon Phase", "Arch Mon/Survey Phase"
+]
+
+
+def FileSha256(path):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def LoadMasterTracker(workbook_path) -> pd.DataFrame:
+    """Load the MAT sheet from a columnar cache next to the workbook, rebuilding it only when the workbook changes.
+
+    The cache is Parquet when pyarrow is installed and a pickle otherwise. It is keyed by the
+    workbook's mtime and size, falling back to a content hash when those change.
+    """
+    try:
+        import pyarrow  # noqa: F401
+        cache_path = workbook_path + ".cache.parquet"
+        read_cache, write_cache = pd.read_parquet, lambda df, path: df.to_parquet(path, index=False)
+    except ImportError:
+        cache_path = workbook_path + ".cache.pkl"
+        read_cache, write_cache = pd.read_pickle, lambda df, path: df.to_pickle(path)
+    meta_path = workbook_path + ".cache.json"
+
+    stat = os.stat(workbook_path)
+    key = {"mtime": stat.st_mtime, "size": stat.st_size, "columns": master_tracker_columns}
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(cache_path):
+        with open(meta_path, 'r') as meta_file:
+            meta = json.load(meta_file)
+
+    # Same mtime and size, or a touched file with the same content, means the cache is current
+    if meta and meta.get("columns") == master_tracker_columns:
+        if meta.get("mtime") == key["mtime"] and meta.get("size") == key["size"]:
+            return read_cache(cache_path)
+        key["sha256"] = FileSha256(workbook_path)
+        if meta.get("sha256") == key["sha256"]:
+            with open(meta_path, 'w') as meta_file:
+                json.dump(key, meta_file)
+            return read_cache(cache_path)
+
+    print("Master Tracker changed, rebuilding the cached snapshot...")
+    df = pd.read_excel(workbook_path, sheet_name="MAT", usecols=master_tracker_columns,
+                       dtype={column: str for column in master_tracker_columns})
+    key.setdefault("sha256", FileSha256(workbook_path))
+    write_cache(df, cache_path)
+    with open(meta_path, 'w') as meta_file:
+        json.dump(key, meta_file)
+    return df
+
+
+# The Master Tracker sheet, loaded on first use so the module can be imported without the workbook
+dfm = None
+dfm_lock = threading.Lock()
+
+
+def GetMasterTracker() -> pd.DataFrame:
+    """Return the Master Tracker sheet, loading it once."""
+    global dfm
+    with dfm_lock:
+        if dfm is None:
+            dfm = LoadMasterTracker(masterTrackerXlPath)
+        return dfm
+
+
+# Time and peak memory per processing stage, filled in when --profile-stages is given
+stage_stats = {}
+stage_stats_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def TimedStage(name):
+    """Accumulate the wall time and peak traced memory of a processing stage."""
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    tracemalloc.reset_peak()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - start_memory
+        with stage_stats_lock:
+            stats = stage_stats.setdefault(name, {"calls": 0, "seconds": 0.0, "peak_mb": 0.0})
+            stats["calls"] += 1
+            stats["seconds"] += elapsed
+            stats["peak_mb"] = max(stats["peak_mb"], peak / (1024 * 1024))
+
+
+def PrintStageReport():
+    """Print the collected stage timings and peak memory."""
+    print(f"{'Stage':<20}{'Calls':>8}{'Seconds':>12}{'Peak MB':>12}")
+    for name, stats in stage_stats.items():
+        print(f"{name:<20}{stats['calls']:>8}{stats['seconds']:>12.3f}{stats['peak_mb']:>12.1f}")
+
+
+def sql_timestamp(value):
+    """Return a datetime as a SQL timestamp literal for a feature service where clause."""
+    return f"timestamp '{value.strftime('%Y-%m-%d %H:%M:%S')}'"
+
+
+def GetDfFromFC(vm_layer, company_name, start=None, end=None) -> pd.DataFrame:
+    """Convert a feature class table to a pandas DataFrame, limited to EndDate in [start, end) when given.
+
+    company_name may be a single name, a list of names (queried with ERM_Company_Name IN (...))
+    or None for every company.
+    """
     columns = ["EndDate", "StartDate", "ERM_FirstName", "ERM_SurveyorName",
                "ConsultantProjectIdentifier", "LocationID", "BioFieldType",
-               "ERM_Form_Type", "GlobalID", "ERM_Begin_Survey"]
-    sql = f"ERM_Company_Name = '{company_name}'"
+               "ERM_Form_Type", "GlobalID", "ERM_Begin_Survey", "ERM_Company_Name"]
+    date_sql = ""
+    if start is not None:
+        date_sql += f" AND EndDate >= {sql_timestamp(start)}"
+    if end is not None:
+        date_sql += f" AND EndDate < {sql_timestamp(end)}"
+
+    if company_name is None:
+        company_clauses = ["1=1"]
+    elif isinstance(company_name, str):
+        company_clauses = [f"ERM_Company_Name = {sql_quote(company_name)}"]
+    else:
+        company_clauses = list(build_in_clauses("ERM_Company_Name", company_name))
 
-    with arcpy.da.SearchCursor(vm_layer, columns, sql) as cursor:
-        data = [row for row in cursor]
+    data = []
+    for company_sql in company_clauses:
+        with arcpy.da.SearchCursor(vm_layer, columns, f"({company_sql}){date_sql}") as cursor:
+            data.extend(row for row in cursor)
 
     return pd.DataFrame(data=data, columns=columns)
 
 
-def GetPhotoDfFromFC(vm_photo_layer, sql) -> pd.DataFrame:
-    """Convert a feature class table to a pandas DataFrame for photos."""
-    columns = ["GlobalID", "ResourceSupportReqPhoto", "Survey_Monitor_WorkType", "PhotoWorkStatus",
-               "PhotoViewFrame", "PhotoMetadataDirection", "PhotoViewDirection", "PhotoLocationID",
-               "PhotoComment", "parentglobalid", "CreationDate", "Creator", "EditDate", "Editor"]
+def GetPhotoDfFromFC(vm_photo_layer, sql, columns=None) -> pd.DataFrame:
+    """Convert a feature class table to a pandas DataFrame for photos, optionally reading only some columns."""
+    columns = columns or ["GlobalID", "ResourceSupportReqPhoto", "Survey_Monitor_WorkType", "PhotoWorkStatus",
+                          "PhotoViewFrame", "PhotoMetadataDirection", "PhotoViewDirection", "PhotoLocationID",
+                          "PhotoComment", "parentglobalid", "CreationDate", "Creator", "EditDate", "Editor"]
 
     with arcpy.da.SearchCursor(vm_photo_layer, columns, sql) as cursor:
         data = [row for row in cursor]
@@ -89,6 +248,46 @@ def GetPhotoDfFromFC(vm_photo_layer, sql) -> pd.DataFrame:
     return pd.DataFrame(data=data, columns=columns)
 
 
+def sql_quote(value):
+    """Return the value as a single-quoted SQL string literal with embedded quotes escaped."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def build_in_clauses(field, values, max_values=None, max_length=None):
+    """Yield de-duplicated, escaped "field IN (...)" clauses that stay within the size limits."""
+    max_values = max_values or max_in_clause_values
+    max_length = max_length or max_where_clause_length
+    prefix = f"{field} IN ("
+    chunk, chunk_length = [], len(prefix) + 1
+    for value in dict.fromkeys(v for v in values if v is not None):
+        quoted = sql_quote(value)
+        if chunk and (len(chunk) >= max_values or chunk_length + len(quoted) + 2 > max_length):
+            yield prefix + ", ".join(chunk) + ")"
+            chunk, chunk_length = [], len(prefix) + 1
+        chunk.append(quoted)
+        chunk_length += len(quoted) + 2
+    if chunk:
+        yield prefix + ", ".join(chunk) + ")"
+
+
+def GetPhotoDfForGuids(vm_photo_layer, guid_list, columns=None) -> pd.DataFrame:
+    """Fetch the photos for a list of parent GUIDs using chunked queries.
+
+    The chunks run one after another because arcpy cursors on the shared table view are not thread-safe.
+    """
+    sql_chunks = list(build_in_clauses("parentglobalid", guid_list))
+    if not sql_chunks:
+        return GetPhotoDfFromFC(vm_photo_layer, "1=0", columns)
+    frames = [GetPhotoDfFromFC(vm_photo_layer, sql, columns) for sql in sql_chunks]
+    return pd.concat(frames, ignore_index=True)
+
+
+def GetPhotoCounts(vm_photo_layer, guid_list) -> pd.Series:
+    """Count photos per parent GUID, reading only the parentglobalid column."""
+    photo_df = GetPhotoDfForGuids(vm_photo_layer, guid_list, columns=["parentglobalid"])
+    return photo_df['parentglobalid'].value_counts()
+
+
 def aggregate_unique_values(series):
     """Aggregate unique values in a column."""
     all_values = [item for sublist in series.str.split(',') for item in sublist]
@@ -96,134 +295,537 @@ def aggregate_unique_values(series):
     return ','.join(unique_values)
 
 
-def ProcessSubConsultant(sub_consultant_name, output_folder):
-    """Process data for a sub-consultant and export."""
-    print(f"Processing data for {sub_consultant_name}...")
-    sub_consultant_df = GetDfFromFC(vm_layer, sub_consultant_name)
+def BuildSubmissionSummary(sub_consultant_df, date_submitted, photo_counts) -> pd.DataFrame:
+    """Reshape a sub-consultant's raw submissions into the Daily Submission Summary sheet."""
+    # Map the photo counts to the main DataFrame
+    sub_consultant_df["Number of Photos"] = sub_consultant_df['GlobalID'].map(photo_counts)
+
+    # Reformat columns and process
+    sub_consultant_df["ERM_Form_Type"] = np.where(
+        sub_consultant_df["BioFieldType"] == "Pre-Activity Survey",
+        "Bio Survey",
+        sub_consultant_df['ERM_Form_Type']
+    )
+    sub_consultant_df["ERM_Form_Type"] = np.where(
+        (sub_consultant_df["BioFieldType"] == "TBD") &
+        (sub_consultant_df["ConsultantProjectIdentifier"].str.contains('Monitor')),
+        "Arch Monitor",
+        sub_consultant_df["ERM_Form_Type"]
+    )
+    sub_consultant_df["ERM_Form_Type"] = np.where(
+        (sub_consultant_df["BioFieldType"] == "TBD") &
+        (sub_consultant_df["ConsultantProjectIdentifier"].str.contains('Survey')),
+        "Arch Survey",
+        sub_consultant_df["ERM_Form_Type"]
+    )
+    sub_consultant_df["ERM_Begin_Survey"] = np.where(
+        sub_consultant_df["ERM_Begin_Survey"].isnull(),
+        "Yes",
+        sub_consultant_df['ERM_Begin_Survey']
+    )
+    sub_consultant_df.drop(['BioFieldType', 'GlobalID', 'ERM_Company_Name'], axis=1, inplace=True)
+    sub_consultant_df.rename(columns=column_mapping, inplace=True)
+
+    # Format date columns
+    sub_consultant_df['Date Form Submitted'] = date_submitted.dt.strftime('%m/%d/%Y %H:%M')
+    sub_consultant_df['Date Actually Surveyed or Monitored'] = pd.to_datetime(
+        sub_consultant_df['Date Actually Surveyed or Monitored'], format='%m/%d/%Y %H:%M:%S.%f'
+    ).dt.strftime('%m/%d/%Y %H:%M')
+
+    return sub_consultant_df
+
+
+def BuildInvoicingSummary(filtered_df, dfm) -> pd.DataFrame:
+    """Merge the Daily Submission Summary with the Master Tracker and group it by phase for invoicing."""
+    # Process for invoicing summary
+    woid_list = filtered_df['Work Order ID'].tolist()
+    dfm_yest = dfm[dfm['Work Order ID'].isin(woid_list)]
+    dfm_refined = dfm_yest[master_tracker_columns]
+    dfm_merge = pd.merge(filtered_df, dfm_refined, on="Work Order ID")
+    dfm_merge = dfm_merge.drop(columns=[
+        'Date Form Submitted', 'Form Type', 'Number of Photos', 'Accessed?'
+    ])
+
+    # Format the date and group data by phase
+    dfm_merge["Date"] = pd.to_datetime(
+        dfm_merge["Date Actually Surveyed or Monitored"], format='%m/%d/%Y %H:%M'
+    ).dt.strftime('%m/%d/%Y').astype(str)
+    dfm_merge["Date"] = dfm_merge['Date'].astype(str)
+
+    field_list = ["First Name", "Last Name", "Date"]
+    for field in field_list:
+        dfm_merge[field] = dfm_merge[field].str.strip()
+
+    # Convert the IDs with map(str) before melting, as the old join did, so a missing ID becomes
+    # "None" or "nan" text; astype(str) leaves NaN in pandas 3 and the join fails
+    dfm_merge["Location ID"] = dfm_merge["Location ID"].map(str).str.replace(" ", "", regex=False)
+
+    # Stack the phase columns into one long frame and group every phase in a single pass,
+    # keeping the phase column order and each Location ID list in row order
+    phase_columns = [
+        "NBS", "Field Survey", "Plant Survey", "Bio Mon Phase",
+        "Waters Mon Phase", "Arch Mon/Survey Phase"
+    ]
+    dfm_long = dfm_merge.melt(
+        id_vars=field_list + ["Location ID"], value_vars=phase_columns,
+        var_name="Phase Column", value_name="Phase"
+    ).dropna(subset=["Phase"])
+    dfm_long["Phase Column"] = pd.Categorical(dfm_long["Phase Column"], categories=phase_columns, ordered=True)
+    dfm_2merge = dfm_long.groupby(["Phase Column", "Phase"] + field_list, observed=True, sort=True).agg(
+        {"Location ID": ','.join}
+    ).reset_index().drop(columns=["Phase Column"])
+
+    dfm_2merge["Hours"] = ""  # Add Hours column
+    desired_order = ['First Name', 'Last Name', 'Date', 'Location ID', 'Phase', 'Hours']
+    dfm_2merge = dfm_2merge[desired_order]
+
+    return dfm_2merge
+
+
+def ProcessSubConsultant(sub_consultant_name, output_folder, sub_consultant_df=None, photo_counts=None,
+                         send_email=True, report_day=None):
+    """Process data for a sub-consultant and export.
+
+    Submissions and photo counts already fetched by a batch run can be passed in; otherwise they are
+    queried for this sub-consultant. report_day is midnight of the day to report on and defaults to
+    yesterday. Returns the workbook path to email, or None if there was nothing to report or the
+    sub-consultant's output is CSV or Parquet.
+    """
+    report_day = report_day or query_start
+    report_day_end = report_day + timedelta(days=1)
+    print(f"Processing data for {sub_consultant_name} on {report_day:%m/%d/%Y}...")
+    if sub_consultant_df is None:
+        with TimedStage("fetch submissions"):
+            sub_consultant_df = GetDfFromFC(vm_layer, sub_consultant_name, report_day, report_day_end)
 
     if not sub_consultant_df.empty:
-        guid_list = sub_consultant_df['GlobalID'].tolist()
-        if len(guid_list) > 1:
-            where_sub_ph = f"parentglobalid IN {tuple(guid_list)}"
-        else:
-            where_sub_ph = f"parentglobalid = '{guid_list[0]}'"
-
-        sub_ph_df = GetPhotoDfFromFC(vm_photo_layer, where_sub_ph)
-
-        # Count the number of photos per GUID
-        uni_guids = pd.unique(sub_ph_df['parentglobalid'])
-        sub_guid_dict = {guid: sub_ph_df['parentglobalid'].value_counts()[guid] for guid in uni_guids}
-
-        # Map the photo counts to the main DataFrame
-        sub_consultant_df["Number of Photos"] = sub_consultant_df['GlobalID'].map(sub_guid_dict)
-
-        # Reformat columns and process
-        sub_consultant_df["ERM_Form_Type"] = np.where(
-            sub_consultant_df["BioFieldType"] == "Pre-Activity Survey",
-            "Bio Survey",
-            sub_consultant_df['ERM_Form_Type']
-        )
-        sub_consultant_df["ERM_Form_Type"] = np.where(
-            (sub_consultant_df["BioFieldType"] == "TBD") &
-            (sub_consultant_df["ConsultantProjectIdentifier"].str.contains('Monitor')),
-            "Arch Monitor",
-            sub_consultant_df["ERM_Form_Type"]
-        )
-        sub_consultant_df["ERM_Form_Type"] = np.where(
-            (sub_consultant_df["BioFieldType"] == "TBD") &
-            (sub_consultant_df["ConsultantProjectIdentifier"].str.contains('Survey')),
-            "Arch Survey",
-            sub_consultant_df["ERM_Form_Type"]
-        )
-        sub_consultant_df["ERM_Begin_Survey"] = np.where(
-            sub_consultant_df["ERM_Begin_Survey"].isnull(),
-            "Yes",
-            sub_consultant_df['ERM_Begin_Survey']
-        )
-        sub_consultant_df.drop(['BioFieldType', 'GlobalID'], axis=1, inplace=True)
-        sub_consultant_df.rename(columns=column_mapping, inplace=True)
-
-        # Format date columns
-        sub_consultant_df['Date Form Submitted'] = pd.to_datetime(
-            sub_consultant_df['Date Form Submitted'], format='%m/%d/%Y %H:%M:%S.%f'
-        ).dt.strftime('%m/%d/%Y %H:%M')
-        sub_consultant_df['Date Actually Surveyed or Monitored'] = pd.to_datetime(
-            sub_consultant_df['Date Actually Surveyed or Monitored'], format='%m/%d/%Y %H:%M:%S.%f'
-        ).dt.strftime('%m/%d/%Y %H:%M')
-
-        # Filter data for yesterday's date range
-        filtered_df = sub_consultant_df.loc[
-            (sub_consultant_df['Date Form Submitted'] >= yesterday_df_min) &
-            (sub_consultant_df['Date Form Submitted'] <= yesterday_df_max)
-        ]
-
-        if filtered_df.empty:
+        # Filter data for yesterday's date range, comparing datetimes rather than formatted strings,
+        # before fetching photos so only the surviving submissions are queried
+        with TimedStage("window filter"):
+            date_submitted = pd.to_datetime(sub_consultant_df['EndDate'], format='%m/%d/%Y %H:%M:%S.%f')
+            in_window = (date_submitted >= report_day) & (date_submitted < report_day_end)
+            sub_consultant_df = sub_consultant_df.loc[in_window].copy()
+            date_submitted = date_submitted.loc[in_window]
+
+        if sub_consultant_df.empty:
             print(f"No forms submitted yesterday by {sub_consultant_name}.")
-            return
+            return None
 
-        # Process for invoicing summary
-        woid_list = filtered_df['Work Order ID'].tolist()
-        dfm_yest = dfm[dfm['Work Order ID'].isin(woid_list)]
-        dfm_refined = dfm_yest[[
-            "Work Order ID", "NBS", "Field Survey", "Plant Survey",
-            "Bio Mon Phase", "Waters Mon Phase", "Arch Mon/Survey Phase"
-        ]]
-        dfm_merge = pd.merge(filtered_df, dfm_refined, on="Work Order ID")
-        dfm_merge = dfm_merge.drop(columns=[
-            'Date Form Submitted', 'Form Type', 'Number of Photos', 'Accessed?'
-        ])
-
-        # Format the date and group data by phase
-        dfm_merge["Date"] = pd.to_datetime(
-            dfm_merge["Date Actually Surveyed or Monitored"], format='%m/%d/%Y %H:%M'
-        ).dt.strftime('%m/%d/%Y').astype(str)
-        dfm_merge["Date"] = dfm_merge['Date'].astype(str)
-
-        field_list = ["First Name", "Last Name", "Date"]
-        for field in field_list:
-            dfm_merge[field] = dfm_merge[field].apply(lambda x: x.strip())
-
-        # Group by phase and aggregate unique Location IDs
-        grouped_phases = []
-        phase_columns = [
-            "NBS", "Field Survey", "Plant Survey", "Bio Mon Phase",
-            "Waters Mon Phase", "Arch Mon/Survey Phase"
-        ]
-        for phase in phase_columns:
-            grouped = dfm_merge.groupby([phase, "First Name", "Last Name", "Date"], as_index=False).agg(
-                {'Location ID': lambda x: list(x)}
-            )
-            grouped_phases.append(grouped)
-
-        dfm_2merge = pd.concat(grouped_phases)
-        dfm_2merge["Phase"] = dfm_2merge[phase_columns].bfill(axis=1).iloc[:, 0]
-        dfm_2merge["Location ID"] = dfm_2merge["Location ID"].apply(
-            lambda x: ','.join(map(str, x)).replace(" ", "")
-        )
-        dfm_2merge = dfm_2merge.drop(columns=phase_columns).reset_index(drop=True)
-
-        dfm_2merge["Hours"] = ""  # Add Hours column
-        desired_order = ['First Name', 'Last Name', 'Date', 'Location ID', 'Phase', 'Hours']
-        dfm_2merge = dfm_2merge[desired_order]
-
-        # Write to Excel
-        sub_excel = os.path.join(output_folder, f"{sub_consultant_name}_{YYYYMMDD}.xlsx")
-        with pd.ExcelWriter(sub_excel) as writer:
-            filtered_df.to_excel(writer, sheet_name='Daily Submission Summary', index=False)
-            dfm_2merge.to_excel(writer, sheet_name='Invoicing Summary', index=False)
+        # Count the number of photos per GUID in one grouped pass
+        if photo_counts is None:
+            with TimedStage("photo counts"):
+                guid_list = sub_consultant_df['GlobalID'].tolist()
+                photo_counts = GetPhotoCounts(vm_photo_layer, guid_list)
+
+        with TimedStage("submission summary"):
+            filtered_df = BuildSubmissionSummary(sub_consultant_df, date_submitted, photo_counts)
+
+        with TimedStage("invoicing summary"):
+            dfm_2merge = BuildInvoicingSummary(filtered_df, GetMasterTracker())
+
+        # Write the report, stamped with the run date, the day after the submissions
+        with TimedStage("write report"):
+            report_paths = WriteReport(sub_consultant_name, f"{report_day_end:%Y%m%d_}", output_folder, {
+                'Daily Submission Summary': filtered_df,
+                'Invoicing Summary': dfm_2merge,
+            })
+        sub_excel = report_paths[0] if report_paths[0].endswith(".xlsx") else None
 
         # Send email
-        toVal = 'example1@domain.com; example2@domain.com'
-        ccVal = 'examplecc@domain.com'
-        subject = f"Daily Form Submissions - {sub_consultant_name} ({yesterday_print})"
-        scriptPath = r"C:\REPLACE_WITH_PATH\send_email_script.vbs"
-        html = f"<p>Here are the submissions for {yesterday_print}.</p>"
-        os.system(f'{scriptPath} "{toVal}" "{ccVal}" "{subject}" "{html}" "{sub_excel}"')
+        if send_email and sub_excel:
+            SendSubConsultantEmail(sub_consultant_name, sub_excel, report_day.strftime('%m/%d/%Y'))
 
         print(f"Data for {sub_consultant_name} processed and exported successfully.")
+        return sub_excel
     else:
         print(f"No forms submitted by {sub_consultant_name}.")
+        return None
+
 
+def GetReportOutput(sub_consultant_name):
+    """Return the output format and folder settings for a sub-consultant."""
+    return {**default_report_output, **report_output_settings.get(sub_consultant_name, {})}
+
+
+def WriteStreamingExcel(path, sheets):
+    """Write DataFrames to an Excel workbook row by row without holding the workbook in memory.
+
+    Uses xlsxwriter's constant_memory mode, or openpyxl's write-only mode, falling back to
+    pd.ExcelWriter when neither is installed.
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+    try:
+        import openpyxl
+    except ImportError:
+        openpyxl = None
+
+    def iter_rows(df):
+        # Blank cells rather than NaN, which neither engine writes
+        yield list(df.columns)
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            yield row
+
+    if xlsxwriter is not None:
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+        for sheet_name, df in sheets.items():
+            worksheet = workbook.add_worksheet(sheet_name)
+            for row_index, row in enumerate(iter_rows(df)):
+                worksheet.write_row(row_index, 0, row)
+        workbook.close()
+    elif openpyxl is not None:
+        workbook = openpyxl.Workbook(write_only=True)
+        for sheet_name, df in sheets.items():
+            worksheet = workbook.create_sheet(sheet_name)
+            for row in iter_rows(df):
+                worksheet.append(list(row))
+        workbook.save(path)
+    else:
+        with pd.ExcelWriter(path) as writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def WriteReport(sub_consultant_name, file_date, output_folder, sheets):
+    """Write the report sheets in the sub-consultant's configured format and return the paths written."""
+    output = GetReportOutput(sub_consultant_name)
+    folder = output["folder"] or output_folder
+    base_path = os.path.join(folder, f"{sub_consultant_name}_{file_date}")
+
+    if output["format"] == "xlsx":
+        path = base_path + ".xlsx"
+        WriteStreamingExcel(path, sheets)
+        return [path]
+
+    paths = []
+    for sheet_name, df in sheets.items():
+        path = f"{base_path}{sheet_name.replace(' ', '_')}.{output['format']}"
+        if output["format"] == "csv":
+            df.to_csv(path, index=False)
+        elif output["format"] == "parquet":
+            df.astype(str).where(df.notna(), None).to_parquet(path, index=False)
+        else:
+            raise ValueError(f"Unknown report format for {sub_consultant_name}: {output['format']}")
+        paths.append(path)
+    return paths
+
+
+class SmtpTransport:
+    """Send outbox messages through an SMTP server."""
+
+    name = "smtp"
+
+    def __init__(self, host, port, user=None, password=None, sender=None, use_tls=True, timeout=60):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.sender = sender
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    @staticmethod
+    def split_addresses(addresses):
+        """Split a ";" or ","-separated recipient list into addresses."""
+        return [address.strip() for address in (addresses or "").replace(";", ",").split(",") if address.strip()]
+
+    def send(self, message):
+        # Recipient lists are written for the .vbs script with ";" separators, which SMTP headers do not use
+        to = self.split_addresses(message["to"])
+        cc = self.split_addresses(message["cc"])
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = ", ".join(to)
+        if cc:
+            email["Cc"] = ", ".join(cc)
+        email["Subject"] = message["subject"]
+        email.set_content("This message contains HTML content.")
+        email.add_alternative(message["html"], subtype="html")
+        for path in message["attachments"]:
+            mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            maintype, subtype = mime_type.split("/", 1)
+            with open(path, 'rb') as file:
+                email.add_attachment(file.read(), maintype=maintype, subtype=subtype,
+                                     filename=os.path.basename(path))
+
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as server:
+            if self.use_tls:
+                server.starttls()
+            if self.user:
+                server.login(self.user, self.password)
+            server.send_message(email, to_addrs=to + cc)
+
+
+class ScriptTransport:
+    """Send outbox messages through the legacy .vbs email script."""
+
+    name = "script"
+
+    def __init__(self, script_path):
+        self.script_path = script_path
+
+    def send(self, message):
+        # Arguments are passed as a list so the HTML body is not mangled by shell quoting
+        subprocess.run(["cscript", "//nologo", self.script_path, message["to"], message["cc"],
+                        message["subject"], message["html"], *message["attachments"]], check=True)
+
+
+class EmailOutbox:
+    """Queue outgoing messages and send them concurrently, with retries, through a list of transports.
+
+    Each message is saved as a JSON file in the outbox folder when queued and removed once sent,
+    so messages that never went out are picked up again by resend_pending() on the next run.
+    """
+
+    def __init__(self, folder, transports, max_attempts=None, retry_delay=None, max_workers=None):
+        self.folder = folder
+        self.transports = transports
+        self.max_attempts = max_attempts or email_max_attempts
+        self.retry_delay = email_retry_delay if retry_delay is None else retry_delay
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or email_workers)
+        self.futures = {}
+
+    def queue(self, to, cc, subject, html, attachments=()):
+        """Persist a message to the outbox and start sending it in the background."""
+        message = {
+            "id": uuid.uuid4().hex,
+            "to": to,
+            "cc": cc,
+            "subject": subject,
+            "html": html,
+            "attachments": list(attachments),
+            "queued": datetime.now().isoformat(),
+        }
+        self._save(message)
+        self._submit(message)
+        return message["id"]
+
+    def resend_pending(self):
+        """Queue every message left in the outbox by an earlier run."""
+        if not os.path.isdir(self.folder):
+            return
+        for file_name in sorted(os.listdir(self.folder)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(self.folder, file_name), 'r') as file:
+                    message = json.load(file)
+                if message["id"] not in self.futures:
+                    print(f"Resending unsent email: {message['subject']}")
+                    self._submit(message)
+
+    def flush(self):
+        """Wait for every queued message and return the subjects and errors of those that failed."""
+        failures = {}
+        for message_id, future in list(self.futures.items()):
+            subject, error = future.result()
+            if error is not None:
+                failures[subject] = error
+            del self.futures[message_id]
+        return failures
+
+    def _path(self, message):
+        return os.path.join(self.folder, f"{message['id']}.json")
+
+    def _save(self, message):
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = self._path(message) + ".tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(message, file, indent=2)
+        os.replace(temp_path, self._path(message))
+
+    def _submit(self, message):
+        self.futures[message["id"]] = self.executor.submit(self._send, message)
+
+    def _send(self, message):
+        """Try each transport in order, retrying the whole list with exponential backoff."""
+        delay = self.retry_delay
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            for transport in self.transports:
+                try:
+                    transport.send(message)
+                except Exception as e:
+                    error = e
+                    print(f"Email '{message['subject']}' failed via {transport.name} "
+                          f"(attempt {attempt}/{self.max_attempts}): {e}")
+                    continue
+                # The message is sent, so a problem removing its saved copy must not trigger another send
+                try:
+                    os.remove(self._path(message))
+                except OSError as e:
+                    print(f"Email '{message['subject']}' was sent but could not be removed from the outbox: {e}")
+                return message["subject"], None
+            if attempt < self.max_attempts:
+                time.sleep(delay)
+                delay *= 2
+        return message["subject"], error
+
+
+email_outbox = EmailOutbox(email_outbox_folder, [
+    SmtpTransport(smtp_host, smtp_port, smtp_user, smtp_password, email_sender),
+    ScriptTransport(email_script_path),
+])
+
+
+def SendSubConsultantEmail(sub_consultant_name, sub_excel, report_day_print=yesterday_print):
+    """Queue a sub-consultant's daily report for sending."""
+    toVal = 'example1@domain.com; example2@domain.com'
+    ccVal = 'examplecc@domain.com'
+    subject = f"Daily Form Submissions - {sub_consultant_name} ({report_day_print})"
+    html = f"<p>Here are the submissions for {report_day_print}.</p>"
+    email_outbox.queue(toVal, ccVal, subject, html, [sub_excel])
+
+
+def ProcessSubConsultants(sub_consultant_names, output_folder, max_workers=4, start=None, end=None,
+                          report_state=None):
+    """Build reports for several sub-consultants and days from one feature service scan.
+
+    sub_consultant_names is a list of company names or "all". start and end are midnights bounding
+    the days to report on, yesterday by default. Submissions and photo counts for the whole range
+    are read once, partitioned by company and day in memory and each report is built in a worker
+    pool. Emails are sent once every report is built, and a failure for one report does not stop
+    the others. (name, day) pairs already completed in report_state are skipped. Returns the days
+    covered, the completed (name, day) pairs and the failures keyed by (name, day).
+    """
+    start = start or query_start
+    end = end or query_end
+    report_days = [start + timedelta(days=offset) for offset in range((end - start).days)]
+
+    company_filter = None if sub_consultant_names == "all" else list(sub_consultant_names)
+    with TimedStage("fetch submissions"):
+        all_df = GetDfFromFC(vm_layer, company_filter, start, end)
+    if sub_consultant_names == "all":
+        sub_consultant_names = sorted(all_df['ERM_Company_Name'].dropna().unique())
+
+    with TimedStage("photo counts"):
+        photo_counts = GetPhotoCounts(vm_photo_layer, all_df['GlobalID'].tolist())
+    submitted_day = pd.to_datetime(all_df['EndDate'], format='%m/%d/%Y %H:%M:%S.%f').dt.normalize()
+    partitions = {
+        (name, day.to_pydatetime()): group
+        for (name, day), group in all_df.groupby(['ERM_Company_Name', submitted_day])
+    }
+
+    pending = [(name, day) for day in report_days for name in sub_consultant_names
+               if not IsReportComplete(report_state, name, day)]
+    if len(pending) < len(report_days) * len(sub_consultant_names):
+        print(f"Skipping {len(report_days) * len(sub_consultant_names) - len(pending)} report(s) already completed.")
+
+    reports, completed, failures = {}, set(), {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(ProcessSubConsultant, name, output_folder,
+                            partitions.get((name, day), all_df.iloc[0:0]).copy(), photo_counts, False,
+                            day): (name, day)
+            for name, day in pending
+        }
+        for future in concurrent.futures.as_completed(futures):
+            name, day = futures[future]
+            try:
+                sub_excel = future.result()
+                completed.add((name, day))
+                if sub_excel:
+                    reports[(name, day)] = sub_excel
+            except Exception as e:
+                failures[(name, day)] = e
+                print(f"Error processing {name} on {day:%m/%d/%Y}: {e}")
+
+    # Queue the emails once every report has been built
+    for (name, day), sub_excel in sorted(reports.items()):
+        SendSubConsultantEmail(name, sub_excel, day.strftime('%m/%d/%Y'))
+
+    return report_days, completed, failures
+
+
+def LoadReportState(path):
+    """Return the recorded reports as {"YYYY-MM-DD": {"completed": set, "failed": set}}.
+
+    A "*" in completed marks a day whose every report succeeded. Files written in the older
+    {"completed_days": [...]} format are read with each listed day marked complete.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        saved = json.load(file)
+    if "completed_days" in saved:
+        return {day: {"completed": {"*"}, "failed": set()} for day in saved["completed_days"]}
+    return {day: {"completed": set(entry.get("completed", [])), "failed": set(entry.get("failed", []))}
+            for day, entry in saved.get("days", {}).items()}
+
+
+def SaveReportState(path, report_state):
+    """Persist the recorded reports within the catch-up window, writing to a temporary file first."""
+    oldest = (query_start - timedelta(days=max_catch_up_days)).strftime('%Y-%m-%d')
+    days = {day: {"completed": sorted(entry["completed"]), "failed": sorted(entry["failed"])}
+            for day, entry in sorted(report_state.items()) if day >= oldest}
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as file:
+        json.dump({"days": days}, file, indent=2)
+    os.replace(temp_path, path)
+
+
+def RecordReportResults(report_state, sub_consultant_names, report_days, completed, failures):
+    """Add the completed and failed (name, day) pairs of a run to the report state."""
+    for day in report_days:
+        report_state.setdefault(day.strftime('%Y-%m-%d'), {"completed": set(), "failed": set()})
+    for name, day in completed:
+        entry = report_state[day.strftime('%Y-%m-%d')]
+        entry["completed"].add(name)
+        entry["failed"].discard(name)
+    for name, day in failures:
+        entry = report_state[day.strftime('%Y-%m-%d')]
+        entry["failed"].add(name)
+        entry["completed"].discard(name)
+    # With "all" the companies are only known from the data, so a clean day is marked as a whole
+    if sub_consultant_names == "all":
+        for day in report_days:
+            entry = report_state[day.strftime('%Y-%m-%d')]
+            if not entry["failed"]:
+                entry["completed"].add("*")
+
+
+def IsReportComplete(report_state, name, day):
+    """Return whether the report for a sub-consultant and day was already completed."""
+    entry = (report_state or {}).get(day.strftime('%Y-%m-%d'))
+    return bool(entry) and name not in entry["failed"] and ("*" in entry["completed"] or name in entry["completed"])
+
+
+def IsDayComplete(report_state, sub_consultant_names, day):
+    """Return whether every report for a day has been completed."""
+    entry = report_state.get(day.strftime('%Y-%m-%d'))
+    if not entry or entry["failed"]:
+        return False
+    if "*" in entry["completed"]:
+        return True
+    return sub_consultant_names != "all" and set(sub_consultant_names) <= entry["completed"]
+
+
+def GetCatchUpStart(report_state, sub_consultant_names):
+    """Return the earliest incomplete day within the catch-up limit, or None if every day is complete.
+
+    Yesterday is returned when nothing is recorded yet, and days before the first recorded day are
+    not caught up.
+    """
+    if not report_state:
+        return query_start
+    first_recorded = datetime.strptime(min(report_state), '%Y-%m-%d')
+    window = [query_start - timedelta(days=offset) for offset in range(max_catch_up_days)]
+    missed = [day for day in window
+              if day >= first_recorded and not IsDayComplete(report_state, sub_consultant_names, day)]
+    return min(missed) if missed else None
+
+
+def ParseArgs():
+    """Parse the optional backfill date range."""
+    parser = argparse.ArgumentParser(description="Email daily form submission reports to sub-consultants.")
+    parser.add_argument("--start", type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        help="First day to report on (YYYY-MM-DD). Defaults to the earliest day with "
+                             "missing or failed reports.")
+    parser.add_argument("--end", type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        help="Last day to report on, inclusive (YYYY-MM-DD). Defaults to yesterday.")
+    parser.add_argument("--profile-stages", action="store_true",
+                        help="Build reports one at a time and print the time and peak memory of each stage.")
+    return parser.parse_args()
 
 
 def DeleteOutdatedCSVs():
@@ -246,18 +848,47 @@ def DeleteOutdatedCSVs():
 def main():
     try:
         print("Script starting...")
-        sub_consultant_name = "SUB_CONSULTANT_NAME"
+        email_outbox.resend_pending()
+        # List the sub-consultants to report on, or use "all" for every company with submissions
+        sub_consultant_names = ["SUB_CONSULTANT_NAME"]
         output_folder = r"C:\REPLACE_WITH_PATH\SubConsultantReports"
-        ProcessSubConsultant(sub_consultant_name, output_folder)
+        args = ParseArgs()
+        report_state = LoadReportState(completed_days_path)
+        # An explicit --start rebuilds every report in the range; a catch-up run skips completed ones
+        start = args.start or GetCatchUpStart(report_state, sub_consultant_names)
+        end = args.end + timedelta(days=1) if args.end else query_end
+        failures = {}
+        if start is None:
+            print("Every report in the catch-up window is already complete.")
+        else:
+            if args.profile_stages:
+                tracemalloc.start()
+            report_days, completed, failures = ProcessSubConsultants(
+                sub_consultant_names, output_folder, start=start, end=end,
+                max_workers=1 if args.profile_stages else 4,
+                report_state=None if args.start else report_state)
+            if args.profile_stages:
+                PrintStageReport()
+
+            # Record which sub-consultants completed or failed on each day
+            RecordReportResults(report_state, sub_consultant_names, report_days, completed, failures)
+            SaveReportState(completed_days_path, report_state)
+
         DeleteOutdatedCSVs()
+        if failures:
+            raise RuntimeError("; ".join(f"{name} ({day:%m/%d/%Y}): {error}"
+                                         for (name, day), error in failures.items()))
     except Exception as e:
         toVal = 'example1@domain.com'
         ccVal = 'examplecc@domain.com'
-        scriptPath = r"C:\REPLACE_WITH_PATH\send_email_script.vbs"
         html = f"<p>Error: {e}</p>"
         subject = "SCRIPT ERROR"
-        os.system(f'{scriptPath} "{toVal}" "{ccVal}" "{subject}" "{html}"')
+        email_outbox.queue(toVal, ccVal, subject, html)
         print(f"Error occurred: {e}")
+    finally:
+        # Wait for queued mail; anything still unsent stays in the outbox for the next run
+        for subject, error in email_outbox.flush().items():
+            print(f"Email '{subject}' could not be sent and was left in the outbox: {error}")
 
 
 if __name__ == '__main__':
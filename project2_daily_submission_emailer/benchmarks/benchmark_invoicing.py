@@ -0,0 +1,109 @@
+"""Benchmark BuildInvoicingSummary against the six-groupby implementation it replaced.
+
+Generates a Daily Submission Summary of 100,000 forms by default and a matching Master Tracker,
+builds the invoicing summary both ways, checks the frames are identical and prints the timings:
+
+    python benchmarks/benchmark_invoicing.py --forms 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from benchmark_stages import PHASE_COLUMNS, load_script  # noqa: E402
+
+
+def legacy_invoicing_summary(filtered_df, dfm, master_tracker_columns):
+    """The invoicing summary as it was built before the single melt and groupby."""
+    woid_list = filtered_df['Work Order ID'].tolist()
+    dfm_yest = dfm[dfm['Work Order ID'].isin(woid_list)]
+    dfm_refined = dfm_yest[master_tracker_columns]
+    dfm_merge = pd.merge(filtered_df, dfm_refined, on="Work Order ID")
+    dfm_merge = dfm_merge.drop(columns=[
+        'Date Form Submitted', 'Form Type', 'Number of Photos', 'Accessed?'
+    ])
+    dfm_merge["Date"] = pd.to_datetime(
+        dfm_merge["Date Actually Surveyed or Monitored"], format='%m/%d/%Y %H:%M'
+    ).dt.strftime('%m/%d/%Y').astype(str)
+    dfm_merge["Date"] = dfm_merge['Date'].astype(str)
+
+    field_list = ["First Name", "Last Name", "Date"]
+    for field in field_list:
+        dfm_merge[field] = dfm_merge[field].apply(lambda x: x.strip())
+
+    grouped_phases = []
+    for phase in PHASE_COLUMNS:
+        grouped = dfm_merge.groupby([phase, "First Name", "Last Name", "Date"], as_index=False).agg(
+            {'Location ID': lambda x: list(x)}
+        )
+        grouped_phases.append(grouped)
+
+    dfm_2merge = pd.concat(grouped_phases)
+    dfm_2merge["Phase"] = dfm_2merge[PHASE_COLUMNS].bfill(axis=1).iloc[:, 0]
+    dfm_2merge["Location ID"] = dfm_2merge["Location ID"].apply(
+        lambda x: ','.join(map(str, x)).replace(" ", "")
+    )
+    dfm_2merge = dfm_2merge.drop(columns=PHASE_COLUMNS).reset_index(drop=True)
+    dfm_2merge["Hours"] = ""
+    return dfm_2merge[['First Name', 'Last Name', 'Date', 'Location ID', 'Phase', 'Hours']]
+
+
+def make_forms(count, seed=0):
+    """Return a Daily Submission Summary of count forms and a Master Tracker covering them.
+
+    Some Location IDs are missing (None) and some have spaces, as in the live data.
+    """
+    rng = random.Random(seed)
+    work_orders = [f"WO{i:06d}" for i in range(max(count // 5, 1))]
+    filtered_df = pd.DataFrame({
+        "Date Form Submitted": "03/05/2024 10:00",
+        "Date Actually Surveyed or Monitored": [f"03/{rng.randint(1, 28):02d}/2024 0{rng.randint(1, 9)}:30"
+                                                for _ in range(count)],
+        "First Name": [rng.choice([" Ana", "Ben ", "Cy"]) + str(rng.randint(1, 10)) for _ in range(count)],
+        "Last Name": [rng.choice(["Lee", "Moss "]) + str(rng.randint(1, 10)) for _ in range(count)],
+        "Work Order ID": [rng.choice(work_orders) for _ in range(count)],
+        "Location ID": [rng.choice(["LOC 1", "LOC2", None, f"LOC {rng.randint(3, 900)}"]) for _ in range(count)],
+        "Form Type": "Bio Survey",
+        "Accessed?": "Yes",
+        "Number of Photos": 2,
+    })
+    dfm = pd.DataFrame({"Work Order ID": work_orders})
+    for column in PHASE_COLUMNS:
+        dfm[column] = [rng.choice([None, None, f"{column} {rng.randint(1, 3)}"]) for _ in work_orders]
+    return filtered_df, dfm
+
+
+def run(script, form_count):
+    """Build the invoicing summary both ways, check they match and return the timings in seconds."""
+    filtered_df, dfm = make_forms(form_count)
+
+    start = time.perf_counter()
+    legacy = legacy_invoicing_summary(filtered_df.copy(), dfm, script.master_tracker_columns)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = script.BuildInvoicingSummary(filtered_df.copy(), dfm)
+    current_seconds = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(current.reset_index(drop=True), legacy.reset_index(drop=True))
+    return {"forms": form_count, "rows": len(current), "legacy_seconds": legacy_seconds,
+            "current_seconds": current_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--forms", type=int, default=100000, help="Number of generated forms.")
+    args = parser.parse_args()
+
+    result = run(load_script(), args.forms)
+    print(f"{result['forms']} forms -> {result['rows']} invoicing rows: six groupbys "
+          f"{result['legacy_seconds']:.2f}s, melt and groupby {result['current_seconds']:.2f}s "
+          f"({result['legacy_seconds'] / max(result['current_seconds'], 1e-9):.1f}x), output identical")
+
+
+if __name__ == "__main__":
+    main()
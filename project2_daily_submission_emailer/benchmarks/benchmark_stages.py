@@ -0,0 +1,150 @@
+"""Time each stage of a sub-consultant report on generated data, with peak memory per stage.
+
+Generates one day of submissions, their photos and a Master Tracker frame at each size, serves them
+through a fake arcpy SearchCursor and builds the report with ProcessSubConsultant:
+
+    python benchmarks/benchmark_stages.py --sizes 10000 100000 1000000 --format xlsx
+
+The emailer connects to its feature layers when imported, so it is loaded with a stand-in arcpy
+module and the generated data replaces the feature service and the Master Tracker workbook.
+"""
+import argparse
+import contextlib
+import importlib.util
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "DailySubmissionEmailer.py")
+SUB_CONSULTANT = "Benchmark Consulting"
+REPORT_DAY = datetime(2024, 3, 5)
+PHASE_COLUMNS = ["NBS", "Field Survey", "Plant Survey", "Bio Mon Phase", "Waters Mon Phase", "Arch Mon/Survey Phase"]
+
+
+def load_script():
+    """Import the emailer with a stand-in arcpy module and return it."""
+    arcpy = mock.MagicMock(name="arcpy")
+    arcpy.management.MakeFeatureLayer.return_value = "vm_layer"
+    arcpy.management.MakeTableView.return_value = "vm_photo_layer"
+    with mock.patch.dict(sys.modules, {"arcpy": arcpy}), contextlib.redirect_stdout(open(os.devnull, 'w')):
+        spec = importlib.util.spec_from_file_location("daily_submission_emailer", SCRIPT_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+class FakeFeatureService:
+    """Serves generated submissions and photos through arcpy.da.SearchCursor's interface."""
+
+    def __init__(self, submissions, photos_per_guid):
+        self.submissions = submissions
+        self.photos_per_guid = photos_per_guid
+
+    def SearchCursor(self, layer, columns, where_clause=None):
+        if layer == "vm_layer":
+            rows = self.submissions[columns].itertuples(index=False, name=None)
+        else:
+            guids = re.findall(r"'([^']*)'", where_clause or "")
+            rows = (tuple(guid if column == "parentglobalid" else None for column in columns)
+                    for guid in guids for _ in range(self.photos_per_guid.get(guid, 0)))
+        return contextlib.nullcontext(rows)
+
+
+def make_submissions(count, seed=0):
+    """Return one day of generated submissions with the columns GetDfFromFC reads."""
+    rng = np.random.default_rng(seed)
+    work_orders = rng.integers(0, max(count // 4, 1), count)
+    seconds = rng.integers(0, 86400, count)
+    end_dates = [(REPORT_DAY + timedelta(seconds=int(s))).strftime('%m/%d/%Y %H:%M:%S.%f') for s in seconds]
+    start_dates = [(REPORT_DAY + timedelta(seconds=int(s) // 2)).strftime('%m/%d/%Y %H:%M:%S.%f') for s in seconds]
+    kinds = np.array(["Survey", "Monitor"])[rng.integers(0, 2, count)]
+    return pd.DataFrame({
+        "EndDate": end_dates,
+        "StartDate": start_dates,
+        "ERM_FirstName": np.array([" Ana", "Ben ", "Cy", "Dee"])[rng.integers(0, 4, count)],
+        "ERM_SurveyorName": np.array(["Lee", "Moss", "Ng ", "Ortiz"])[rng.integers(0, 4, count)],
+        "ConsultantProjectIdentifier": [f"WO{w:07d} {k}" for w, k in zip(work_orders, kinds)],
+        "LocationID": [f"LOC {i % 5000:05d}" for i in rng.integers(0, 10 ** 6, count)],
+        "BioFieldType": np.array(["Pre-Activity Survey", "TBD", "Other"])[rng.integers(0, 3, count)],
+        "ERM_Form_Type": np.array(["Bio Monitor", "Waters Monitor"])[rng.integers(0, 2, count)],
+        "GlobalID": [f"{{{i:08X}-0000-0000-0000-000000000000}}" for i in range(count)],
+        "ERM_Begin_Survey": np.array(["Yes", "No", None], dtype=object)[rng.integers(0, 3, count)],
+        "ERM_Company_Name": SUB_CONSULTANT,
+    })
+
+
+def make_master_tracker(work_order_ids, count, seed=0):
+    """Return a Master Tracker frame of count rows covering the given Work Order IDs."""
+    rng = random.Random(seed)
+    ids = list(dict.fromkeys(work_order_ids))
+    ids += [f"WO-UNUSED-{i}" for i in range(max(count - len(ids), 0))]
+    frame = {"Work Order ID": ids[:count]}
+    for column in PHASE_COLUMNS:
+        frame[column] = [rng.choice([None, f"{column} 1", f"{column} 2"]) for _ in range(len(frame["Work Order ID"]))]
+    return pd.DataFrame(frame)
+
+
+def run(script, size, report_format="xlsx", photos_per_submission=2, output_folder=None):
+    """Build one report of size submissions and return the per-stage stats and the total time.
+
+    Each stage's peak is measured from the memory in use when the stage starts. The module's
+    arcpy, layers, Master Tracker and report output settings are restored afterwards.
+    """
+    submissions = make_submissions(size)
+    photos_per_guid = dict.fromkeys(submissions["GlobalID"], photos_per_submission)
+    replacements = {
+        "arcpy": SimpleNamespace(da=FakeFeatureService(submissions, photos_per_guid)),
+        "vm_layer": "vm_layer",
+        "vm_photo_layer": "vm_photo_layer",
+        "dfm": make_master_tracker(submissions["ConsultantProjectIdentifier"], size),
+        "default_report_output": {"format": report_format, "folder": None},
+    }
+    originals = {name: getattr(script, name) for name in replacements}
+    for name, value in replacements.items():
+        setattr(script, name, value)
+
+    script.stage_stats.clear()
+    output_folder = output_folder or tempfile.mkdtemp(prefix="emailer_benchmark_")
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            script.ProcessSubConsultant(SUB_CONSULTANT, output_folder, send_email=False, report_day=REPORT_DAY)
+        total_seconds = time.perf_counter() - start
+    finally:
+        tracemalloc.stop()
+        for name, value in originals.items():
+            setattr(script, name, value)
+    return {"stages": {name: dict(stats) for name, stats in script.stage_stats.items()}, "seconds": total_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Numbers of submissions to generate (Master Tracker rows match).")
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet"], default="xlsx",
+                        help="Report output format.")
+    parser.add_argument("--photos", type=int, default=2, help="Photos per submission.")
+    args = parser.parse_args()
+
+    script = load_script()
+    for size in args.sizes:
+        result = run(script, size, args.format, args.photos)
+        print(f"\n{size} submissions, {size * args.photos} photos, {size} Master Tracker rows "
+              f"({args.format}): {result['seconds']:.2f}s")
+        script.PrintStageReport()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""Load the emailer for testing with a stand-in arcpy module."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import benchmark_stages  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def emailer():
+    """Return the imported emailer module."""
+    return benchmark_stages.load_script()
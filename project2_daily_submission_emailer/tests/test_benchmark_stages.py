@@ -0,0 +1,19 @@
+"""The stage benchmark runs end to end on a small generated day."""
+import pytest
+
+import benchmark_stages
+
+
+@pytest.mark.parametrize("report_format", ["xlsx", "csv"])
+def test_benchmark_times_every_stage(emailer, tmp_path, report_format):
+    originals = (emailer.arcpy, emailer.dfm, emailer.vm_layer, emailer.default_report_output)
+
+    result = benchmark_stages.run(emailer, 200, report_format, output_folder=str(tmp_path))
+
+    restored = (emailer.arcpy, emailer.dfm, emailer.vm_layer, emailer.default_report_output)
+    assert all(value is original for value, original in zip(restored, originals))
+
+    assert list(result["stages"]) == ["fetch submissions", "window filter", "photo counts",
+                                      "submission summary", "invoicing summary", "write report"]
+    assert all(stats["calls"] == 1 for stats in result["stages"].values())
+    assert any(tmp_path.iterdir())
@@ -0,0 +1,73 @@
+"""Catch-up runs rebuild only the (sub-consultant, day) reports that are missing or failed."""
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def days(emailer):
+    yesterday = emailer.query_start
+    return [yesterday - timedelta(days=offset) for offset in (2, 1, 0)]
+
+
+def record(emailer, report_state, names, days, completed=(), failed=()):
+    failures = {pair: RuntimeError("failed") for pair in failed}
+    emailer.RecordReportResults(report_state, names, days, set(completed), failures)
+    return report_state
+
+
+def test_no_catch_up_when_yesterday_is_complete(emailer, days):
+    state = record(emailer, {}, ["A", "B"], days, completed=[(name, day) for day in days for name in "AB"])
+
+    assert emailer.GetCatchUpStart(state, ["A", "B"]) is None
+
+
+def test_yesterday_is_reported_when_nothing_is_recorded(emailer):
+    assert emailer.GetCatchUpStart({}, ["A"]) == emailer.query_start
+
+
+def test_catch_up_starts_at_the_earliest_failed_day(emailer, days):
+    completed = [(name, day) for day in days for name in "AB" if (name, day) != ("B", days[1])]
+    state = record(emailer, {}, ["A", "B"], days, completed=completed, failed=[("B", days[1])])
+
+    assert emailer.GetCatchUpStart(state, ["A", "B"]) == days[1]
+    assert not emailer.IsReportComplete(state, "B", days[1])
+    assert emailer.IsReportComplete(state, "A", days[1])
+
+
+def test_catch_up_includes_a_newly_listed_sub_consultant(emailer, days):
+    state = record(emailer, {}, ["A"], days, completed=[("A", day) for day in days])
+
+    assert emailer.GetCatchUpStart(state, ["A"]) is None
+    assert emailer.GetCatchUpStart(state, ["A", "B"]) == days[0]
+
+
+def test_state_round_trip_and_legacy_format(emailer, days, tmp_path):
+    path = str(tmp_path / "completed_days.json")
+    state = record(emailer, {}, "all", days[:1], completed=[("A", days[0])])
+    emailer.SaveReportState(path, state)
+
+    assert emailer.LoadReportState(path) == {days[0].strftime('%Y-%m-%d'): {"completed": {"A", "*"}, "failed": set()}}
+
+    (tmp_path / "legacy.json").write_text('{"completed_days": ["%s"]}' % days[2].strftime('%Y-%m-%d'))
+    legacy = emailer.LoadReportState(str(tmp_path / "legacy.json"))
+    assert emailer.GetCatchUpStart(legacy, ["A"]) is None
+
+
+def test_process_sub_consultants_skips_completed_pairs(emailer, days, monkeypatch):
+    built = []
+    monkeypatch.setattr(emailer, "GetDfFromFC", lambda *args: pd.DataFrame(
+        columns=["EndDate", "GlobalID", "ERM_Company_Name"]))
+    monkeypatch.setattr(emailer, "GetPhotoCounts", lambda *args: pd.Series(dtype=int))
+    monkeypatch.setattr(emailer, "ProcessSubConsultant",
+                        lambda name, folder, df, counts, send, day: built.append((name, day)))
+    completed = [(name, day) for day in days for name in "AB" if (name, day) != ("B", days[1])]
+    state = record(emailer, {}, ["A", "B"], days, completed=completed, failed=[("B", days[1])])
+
+    report_days, done, failures = emailer.ProcessSubConsultants(
+        ["A", "B"], "unused", max_workers=1, start=days[1], end=days[2] + timedelta(days=1), report_state=state)
+
+    assert built == [("B", days[1])]
+    assert done == {("B", days[1])} and not failures
+    assert report_days == days[1:]
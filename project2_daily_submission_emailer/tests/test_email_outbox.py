@@ -0,0 +1,110 @@
+"""The email outbox and SMTP transport against a local SMTP server."""
+import os
+import socketserver
+import threading
+
+import pytest
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    """A minimal SMTP server that records the envelope recipients and data of each message."""
+
+    def handle(self):
+        def reply(line):
+            self.wfile.write((line + "\r\n").encode())
+
+        reply("220 localhost ready")
+        recipients, data, in_data = [], [], False
+        for raw_line in self.rfile:
+            line = raw_line.decode().rstrip("\r\n")
+            command = line.upper()
+            if in_data:
+                if line == ".":
+                    self.server.messages.append({"recipients": recipients, "data": "\n".join(data)})
+                    recipients, data, in_data = [], [], False
+                    reply("250 queued")
+                else:
+                    data.append(line)
+            elif command.startswith("EHLO") or command.startswith("HELO"):
+                reply("250 localhost")
+            elif command.startswith("RCPT TO:"):
+                recipients.append(line[8:].strip().strip("<>"))
+                reply("250 ok")
+            elif command == "DATA":
+                in_data = True
+                reply("354 end with .")
+            elif command == "QUIT":
+                reply("221 bye")
+                return
+            else:
+                reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SmtpHandler)
+    server.daemon_threads = True
+    server.messages = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FailingTransport:
+    name = "failing"
+
+    def __init__(self):
+        self.calls = 0
+
+    def send(self, message):
+        self.calls += 1
+        raise OSError("transport down")
+
+
+def smtp_transport(emailer, server):
+    return emailer.SmtpTransport("127.0.0.1", server.server_address[1], sender="reports@example.com", use_tls=False)
+
+
+def test_semicolon_separated_recipients_all_receive_the_message(emailer, smtp_server, tmp_path):
+    outbox = emailer.EmailOutbox(str(tmp_path / "outbox"), [smtp_transport(emailer, smtp_server)], retry_delay=0)
+    report = tmp_path / "report.xlsx"
+    report.write_bytes(b"report")
+
+    outbox.queue("one@example.com; two@example.com", "cc@example.com", "Daily", "<p>hi</p>", [str(report)])
+
+    assert outbox.flush() == {}
+    [message] = smtp_server.messages
+    assert message["recipients"] == ["one@example.com", "two@example.com", "cc@example.com"]
+    assert "To: one@example.com, two@example.com" in message["data"]
+    assert 'filename="report.xlsx"' in message["data"]
+    assert os.listdir(tmp_path / "outbox") == []
+
+
+def test_unsent_message_stays_in_outbox_and_is_resent(emailer, smtp_server, tmp_path):
+    folder = str(tmp_path / "outbox")
+    failing = emailer.EmailOutbox(folder, [FailingTransport()], max_attempts=2, retry_delay=0)
+    failing.queue("one@example.com", "", "Retry me", "<p>hi</p>")
+
+    assert list(failing.flush()) == ["Retry me"]
+    assert len(os.listdir(folder)) == 1
+
+    outbox = emailer.EmailOutbox(folder, [FailingTransport(), smtp_transport(emailer, smtp_server)], retry_delay=0)
+    outbox.resend_pending()
+
+    assert outbox.flush() == {}
+    assert [message["recipients"] for message in smtp_server.messages] == [["one@example.com"]]
+    assert os.listdir(folder) == []
+
+
+def test_outbox_cleanup_error_does_not_resend(emailer, smtp_server, tmp_path, monkeypatch):
+    fallback = FailingTransport()
+    outbox = emailer.EmailOutbox(str(tmp_path / "outbox"), [smtp_transport(emailer, smtp_server), fallback],
+                                 retry_delay=0)
+    monkeypatch.setattr(outbox, "_path", lambda message: str(tmp_path / "missing" / "message.json"))
+    message = {"id": "1", "to": "one@example.com", "cc": "", "subject": "Once", "html": "", "attachments": []}
+
+    assert outbox._send(message) == ("Once", None)
+    assert len(smtp_server.messages) == 1
+    assert fallback.calls == 0
@@ -0,0 +1,23 @@
+"""BuildInvoicingSummary gives the same frame as the six-groupby implementation it replaced."""
+import pandas as pd
+
+import benchmark_invoicing
+
+
+def test_matches_legacy_implementation(emailer):
+    # run() fails if the two frames differ.
+    result = benchmark_invoicing.run(emailer, 3000)
+
+    assert result["rows"] > 0
+
+
+def test_missing_location_ids_are_joined_as_text(emailer):
+    filtered_df, dfm = benchmark_invoicing.make_forms(20)
+    filtered_df["Location ID"] = None
+    filtered_df.loc[0, "Location ID"] = "LOC 1"
+
+    summary = emailer.BuildInvoicingSummary(filtered_df.copy(), dfm)
+    legacy = benchmark_invoicing.legacy_invoicing_summary(filtered_df.copy(), dfm, emailer.master_tracker_columns)
+
+    assert summary["Location ID"].notna().all()
+    pd.testing.assert_frame_equal(summary.reset_index(drop=True), legacy.reset_index(drop=True))
@@ -1,7 +1,15 @@
+import os
+import sys
+import json
+import contextlib
 import arcpy
 from datetime import datetime
 import Master_MSUP_Points_Updater
 
+# The batched applyEdits writer is shared with the other project scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared'))
+from apply_edits_writer import ApplyEditsWriter
+
 # Paths to the feature classes and their respective "On-hold reason" field names
 feature_classes = [
     {
@@ -129,6 +137,13 @@ districts_list = {
 
 valid_districts = ['39', '49', '51', '52', '53', '85', '86']
 
+# How new features are written to the master: 'cursor' uses an arcpy InsertCursor per source layer,
+# 'rest' sends batched applyEdits requests. Set the token if the service needs one for REST access.
+write_backend = "cursor"
+feature_service_token = None
+apply_edits_batch_size = 250
+apply_edits_workers = 4
+
 # Workspace setup
 workspace = r"REPLACE_WITH_WORKSPACE_PATH"
 arcpy.env.workspace = workspace
@@ -156,23 +171,72 @@ with arcpy.da.SearchCursor(master_feature_class_layer, ["Control_Number_RLC_OID_
     for row in cursor:
         unique_ids.add(row[0])
 
-# Placeholder for source control numbers
+# Control numbers added from the source layers during this run
 source_control_numbers = set()
 
+# Source geometries are read in the master's spatial reference so either backend can write them as is
+master_spatial_reference = arcpy.Describe(master_feature_class_layer).spatialReference
+
 # Functions go here (reused or optimized versions of your original code)
 
-def add_filtered_features(feature_class):
+def is_valid_district(district):
+    """
+    Returns True if a district number or name is one of the valid districts assigned to ERM.
+    """
+    if district is None:
+        return False
+    if isinstance(district, float) and district.is_integer():
+        district = int(district)
+    district = str(district).strip()
+    district = str(districts_list.get(district.upper(), district))
+    return district in valid_districts
+
+def add_filtered_features(feature_class, edit_writer=None):
     """
     Filters features based on criteria and adds them to the master feature class.
+    Features already in the master (by control number) or outside the valid districts are skipped.
+    With an ApplyEditsWriter the features are queued for batched applyEdits instead of an InsertCursor.
+    Returns the number of features added.
     """
     path = feature_class["path"]
-    check_fields = feature_class["check_fields"]
     field_mapping = feature_class["field_mapping"]
+    source_fields = list(field_mapping)
+    insert_fields = [field_mapping[field] for field in source_fields] + ["Source_Feature_Class"]
+
+    added = 0
+    insert_cursor = contextlib.nullcontext() if edit_writer else arcpy.da.InsertCursor(
+        master_feature_class_layer, insert_fields + ["SHAPE@JSON"])
+    with arcpy.da.SearchCursor(path, source_fields + ["SHAPE@JSON"],
+                               spatial_reference=master_spatial_reference) as search_cursor, insert_cursor:
+        for row in search_cursor:
+            attributes = dict(zip(insert_fields, row[:-1]))
+            control_number = attributes.get("Control_Number_RLC_OID_Structur")
+            if control_number in unique_ids or control_number in source_control_numbers:
+                continue
+            if not is_valid_district(attributes.get("District")):
+                continue
+            source_control_numbers.add(control_number)
+            attributes["Source_Feature_Class"] = feature_class["name"]
+
+            if edit_writer:
+                edit_writer.add(attributes, json.loads(row[-1]) if row[-1] else None)
+            else:
+                insert_cursor.insertRow([attributes[field] for field in insert_fields] + [row[-1]])
+            added += 1
+
+    print(f"{feature_class['name']}: {added} feature(s) added to the master.")
+    return added
+
+edit_writer = None
+if write_backend == "rest":
+    edit_writer = ApplyEditsWriter(master_feature_class, token=feature_service_token,
+                                   batch_size=apply_edits_batch_size, max_workers=apply_edits_workers)
+
+for feature_class in feature_classes:
+    add_filtered_features(feature_class, edit_writer)
 
-    with arcpy.da.SearchCursor(path, ["*"]) as search_cursor:
-        with arcpy.da.InsertCursor(master_feature_class_layer, master_fields) as insert_cursor:
-            for row in search_cursor:
-                pass  # Replace with filtering and insertion logic
+if edit_writer:
+    edit_writer.close()
 
 # Remaining code (all functions from your original script)
 
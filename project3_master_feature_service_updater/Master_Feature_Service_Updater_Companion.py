@@ -1,9 +1,346 @@
 """Runs in conjunction with Master_MSUP_WOrkpoints_FS script but can be run separately to do spatial joins only if features already exist in FS
 Created June 2024 by James C.  Work in progress.
 8/1/2024 Added "Waters_Wetlands_Work_Class", "Waters_Wetlands_Review", "Waters_Wetlands_RPMs" spatial join
+10/18/2026 Spatial joins answered from a local spatial index (shapely STRtree) instead of SpatialJoin when shapely is available
+10/18/2026 Static reference layers cached locally and only downloaded again when the source changes
+10/18/2026 Only features missing an attribute are enriched, with only the overlays they need
+10/18/2026 Independent overlays run in parallel, with a timing report per overlay
+10/18/2026 Overlay results written to the empty fields only; features without a match are marked so they are not selected again
 """
 
+import os
+import json
+import time
+import pickle
+import hashlib
+import concurrent.futures
 import arcpy
+import numpy as np
+import requests
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+# Local copies of the static reference layers (geometries and join fields), reused until the source changes
+reference_cache_folder = r"C:\REPLACE_WITH_PATH\MSUP_Reference_Cache"
+reference_cache_max_age_days = 30  # download again after this long even if the source looks unchanged
+
+# Maximum number of overlays answered at the same time
+overlay_max_workers = 4
+
+# Written, by master field type, to an empty target field when no boundary matches the feature, so it is not
+# selected again on the next run. Field types not listed here are left empty.
+no_match_values = {"String": "Not Found", "SmallInteger": -1, "Integer": -1, "BigInteger": -1}
+
+
+def load_geometries(layer, fields=(), spatial_reference=None):
+    """Read a layer's geometries (as shapely geometries) and attribute rows in one cursor pass."""
+    with arcpy.da.SearchCursor(layer, ["SHAPE@WKB", *fields], spatial_reference=spatial_reference) as cursor:
+        rows = [row for row in cursor]
+    geometries = shapely.from_wkb([bytes(row[0]) if row[0] is not None else None for row in rows])
+    return geometries, [tuple(row[1:]) for row in rows]
+
+
+def service_auth():
+    """Return the params and headers that sign REST requests in as the user arcpy is signed in with."""
+    signin = arcpy.GetSigninToken()
+    if not signin:
+        return {}, {}
+    headers = {"Referer": signin["referer"]} if signin.get("referer") else {}
+    return {"token": signin["token"]}, headers
+
+
+def get_layer_version(source):
+    """Return a string that changes whenever a reference layer's data changes.
+
+    Services report their last edit date when they track edits; otherwise the feature count and extent
+    are hashed. File geodatabase layers are fingerprinted by the sizes and modified times of the .gdb files,
+    leaving out the lock files that come and go whenever the geodatabase is opened. Service errors, which
+    come back as HTTP 200 with an "error" body, are raised rather than fingerprinted. Service requests
+    carry the token of the portal arcpy is signed in to, so secured layers can be checked as well.
+    """
+    if source.lower().startswith("http"):
+        auth_params, headers = service_auth()
+        info = requests.get(source, params={"f": "json", **auth_params}, headers=headers, timeout=60).json()
+        if "error" in info:
+            raise RuntimeError(f"Could not read {source}: {info['error']}")
+        last_edit = (info.get("editingInfo") or {}).get("lastEditDate")
+        if last_edit:
+            return f"lastEditDate:{last_edit}"
+        summary = requests.get(f"{source}/query", params={
+            "where": "1=1", "returnCountOnly": "true", "returnExtentOnly": "true", "f": "json", **auth_params
+        }, headers=headers, timeout=60).json()
+        if "error" in summary:
+            raise RuntimeError(f"Could not query {source}: {summary['error']}")
+        return "summary:" + hashlib.sha256(json.dumps(summary, sort_keys=True).encode()).hexdigest()
+
+    gdb_folder = os.path.dirname(source)
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(gdb_folder)):
+        if name.endswith(".lock"):
+            continue
+        stat = os.stat(os.path.join(gdb_folder, name))
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime}".encode())
+    return "files:" + digest.hexdigest()
+
+
+def load_cached_geometries(name, source, layer, fields=(), spatial_reference=None):
+    """Load a static reference layer from the local cache, downloading it again only when the source has changed."""
+    os.makedirs(reference_cache_folder, exist_ok=True)
+    meta_path = os.path.join(reference_cache_folder, f"{name}.json")
+    data_path = os.path.join(reference_cache_folder, f"{name}.pkl")
+
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(data_path):
+        with open(meta_path, 'r') as meta_file:
+            meta = json.load(meta_file)
+
+    key = {
+        "fields": list(fields),
+        "spatial_reference": spatial_reference.exportToString() if spatial_reference else None,
+    }
+    try:
+        key["version"] = get_layer_version(source)
+    except Exception as e:
+        # Without a version to compare, a cached copy is better than failing the run
+        if not meta:
+            # Nothing cached yet, so read the layer through arcpy as the script did before the cache
+            print(f"Could not check {name} for changes, reading it without the cache: {e}")
+            return load_geometries(layer, fields, spatial_reference)
+        print(f"Could not check {name} for changes, using the cached copy: {e}")
+        key["version"] = meta.get("version")
+
+    fresh = time.time() - meta.get("cached_at", 0) < reference_cache_max_age_days * 86400
+    if meta and fresh and all(meta.get(k) == v for k, v in key.items()):
+        with open(data_path, 'rb') as data_file:
+            cached = pickle.load(data_file)
+        return shapely.from_wkb(cached["wkb"]), cached["rows"]
+
+    print(f"Reference layer {name} changed, downloading it again...")
+    geometries, rows = load_geometries(layer, fields, spatial_reference)
+    temp_path = data_path + ".tmp"
+    with open(temp_path, 'wb') as data_file:
+        pickle.dump({"wkb": list(shapely.to_wkb(geometries)), "rows": rows}, data_file,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, data_path)
+    with open(meta_path, 'w') as meta_file:
+        json.dump({**key, "cached_at": time.time()}, meta_file, indent=2)
+    return geometries, rows
+
+
+def overlay(point_ids, points, boundaries, boundary_rows, predicate, kind, field_count=0):
+    """Answer one overlay question for every master point against an STRtree of the boundary polygons.
+
+    predicate is "within" or "intersects". "flag" overlays return 'Yes' or 'No' depending on whether any
+    boundary matches, like Join_Count > 0. "attributes" overlays return the attribute tuple of the first
+    matching boundary in cursor order, or field_count Nones when nothing matches, like a KEEP_ALL SpatialJoin.
+    """
+    tree = shapely.STRtree(boundaries)
+    point_index, boundary_index = tree.query(points, predicate=predicate)
+
+    if kind == "flag":
+        matched = np.zeros(len(point_ids), dtype=bool)
+        matched[point_index] = True
+        return {oid: 'Yes' if hit else 'No' for oid, hit in zip(point_ids, matched.tolist())}
+
+    empty = (None,) * field_count
+    result = {oid: empty for oid in point_ids}
+    order = np.lexsort((boundary_index, point_index))
+    first_points, first_positions = np.unique(point_index[order], return_index=True)
+    for point, boundary in zip(first_points.tolist(), boundary_index[order][first_positions].tolist()):
+        result[point_ids[point]] = boundary_rows[boundary]
+    return result
+
+
+def find_features_to_enrich(master_layer, overlays, where_clause=None, read_shapes=False):
+    """Return, for each overlay, the object IDs of the selected features missing one of its target fields.
+
+    Overlays without "targets" are needed by every selected feature. With read_shapes, the WKB
+    geometry of each selected feature is returned as well, keyed by object ID.
+    """
+    target_fields = sorted({field for spec in overlays for field in spec.get("targets", ())})
+    needed = {spec["name"]: [] for spec in overlays}
+    shapes = {}
+    cursor_fields = ["OID@"] + (["SHAPE@WKB"] if read_shapes else []) + target_fields
+    with arcpy.da.SearchCursor(master_layer, cursor_fields, where_clause) as cursor:
+        for row in cursor:
+            if read_shapes:
+                shapes[row[0]] = bytes(row[1]) if row[1] is not None else None
+            values = dict(zip(target_fields, row[-len(target_fields):] if target_fields else ()))
+            for spec in overlays:
+                targets = spec.get("targets")
+                if not targets or any(values[field] is None for field in targets):
+                    needed[spec["name"]].append(row[0])
+    return needed, shapes
+
+
+def run_overlay_scheduler(overlays, run_overlay, max_workers=None):
+    """Run overlays in a worker pool, starting each one once the overlays it "depends_on" have finished.
+
+    run_overlay(spec) returns an {object ID: value} dict. An overlay with "append_to" has its attribute
+    tuples appended to that overlay's results, which must be listed in its "depends_on". Returns the
+    results by overlay name and prints how long each overlay took.
+    """
+    max_workers = max_workers or overlay_max_workers
+    pending = {spec["name"]: spec for spec in overlays}
+    results, timings, running = {}, {}, {}
+
+    def timed(spec):
+        start = time.perf_counter()
+        result = run_overlay(spec)
+        return result, time.perf_counter() - start
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, spec in list(pending.items()):
+                if all(dependency in results for dependency in spec.get("depends_on", ())):
+                    running[executor.submit(timed, spec)] = spec
+                    del pending[name]
+            if not running:
+                raise ValueError(f"Overlay dependencies cannot be met: {sorted(pending)}")
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                spec = running.pop(future)
+                result, seconds = future.result()
+                results[spec["name"]] = result
+                timings[spec["name"]] = (seconds, len(result))
+                if spec.get("append_to"):
+                    target = results[spec["append_to"]]
+                    for oid, values in result.items():
+                        target[oid] = target.get(oid, ()) + values
+
+    print(f"{'Overlay':<16}{'Features':>10}{'Seconds':>10}")
+    for spec in overlays:
+        seconds, feature_count = timings[spec["name"]]
+        print(f"{spec['name']:<16}{feature_count:>10}{seconds:>10.2f}")
+    return results
+
+
+def run_overlays_with_index(master_layer, overlays, where_clause=None):
+    """Load the features needing enrichment once and answer the overlays they need from a local spatial index.
+
+    Overlays that no selected feature needs are skipped without reading their boundary layer. arcpy cursors
+    are not thread-safe, so the boundary layers are read one at a time on this thread and only the spatial
+    index queries of independent overlays run in parallel through run_overlay_scheduler.
+    """
+    spatial_reference = arcpy.Describe(master_layer).spatialReference
+    needed, shapes = find_features_to_enrich(master_layer, overlays, where_clause, read_shapes=True)
+
+    boundary_layers = {}
+    for spec in overlays:
+        if not needed[spec["name"]]:
+            continue
+        if spec.get("cache"):
+            boundary_layers[spec["name"]] = load_cached_geometries(spec["name"], spec["source"], spec["layer"],
+                                                                   spec.get("fields", ()), spatial_reference)
+        else:
+            boundary_layers[spec["name"]] = load_geometries(spec["layer"], spec.get("fields", ()), spatial_reference)
+
+    def run_overlay(spec):
+        point_ids = needed[spec["name"]]
+        if not point_ids:
+            return {}
+        points = shapely.from_wkb([shapes[oid] for oid in point_ids])
+        boundaries, boundary_rows = boundary_layers[spec["name"]]
+        return overlay(point_ids, points, boundaries, boundary_rows,
+                       spec["predicate"], spec["kind"], len(spec.get("fields", ())))
+
+    return run_overlay_scheduler(overlays, run_overlay)
+
+
+def run_overlays_with_spatial_join(master_layer, overlays, where_clause=None):
+    """Answer the needed overlays with arcpy SpatialJoin on the features selected by where_clause."""
+    arcpy.env.workspace = "in_memory"
+    match_options = {"within": "WITHIN", "intersects": "INTERSECT"}
+    needed, _ = find_features_to_enrich(master_layer, overlays, where_clause)
+    if where_clause:
+        arcpy.management.SelectLayerByAttribute(master_layer, "NEW_SELECTION", where_clause)
+
+    def run_overlay(spec):
+        if not needed[spec["name"]]:
+            return {}
+        temp_fc = f"temp_join_{spec['name']}"
+        if arcpy.Exists(temp_fc):
+            arcpy.Delete_management(temp_fc)
+        arcpy.analysis.SpatialJoin(master_layer, spec["layer"], temp_fc, "KEEP_ALL", match_options[spec["predicate"]])
+
+        result = {}
+        fields = list(spec.get("fields", ()))
+        with arcpy.da.SearchCursor(temp_fc, ["TARGET_FID", "Join_Count"] + fields) as cursor:
+            for row in cursor:
+                if spec["kind"] == "flag":
+                    result[row[0]] = 'Yes' if row[1] > 0 else 'No'
+                else:
+                    result[row[0]] = tuple(row[2:])
+        arcpy.Delete_management(temp_fc)
+        return result
+
+    # Geoprocessing tools are not safe to run from several threads, so SpatialJoin overlays run one at a time
+    results = run_overlay_scheduler(overlays, run_overlay, max_workers=1)
+
+    if where_clause:
+        arcpy.management.SelectLayerByAttribute(master_layer, "CLEAR_SELECTION")
+    return results
+
+
+def enrichment_where_clause(overlays, excluded_internal_ids=()):
+    """Return a where clause selecting the features with an empty target field, leaving out the excluded IDs."""
+    target_fields = sorted({field for spec in overlays for field in spec.get("targets", ())})
+    where_clause = " OR ".join(f"{field} IS NULL" for field in target_fields)
+    if excluded_internal_ids:
+        quoted = ", ".join("'{}'".format(internal_id.replace("'", "''")) for internal_id in excluded_internal_ids)
+        where_clause = f"({where_clause}) AND (Internal_ID IS NULL OR Internal_ID NOT IN ({quoted}))"
+    return where_clause
+
+
+def enrichment_values(oid, overlays, results):
+    """Return the target field values the overlay results give one feature, by field name.
+
+    Attributes overlays fill their targets in order from the answer tuple, including any fields appended
+    to it. Fields whose overlay did not run for the feature are left out, and an overlay that found no
+    match gives None.
+    """
+    values = {}
+    for spec in overlays:
+        answers = results.get(spec["name"], {})
+        if spec.get("append_to") or oid not in answers:
+            continue
+        if spec["kind"] == "flag":
+            for field in spec.get("targets", ()):
+                if values.get(field) != 'Yes':
+                    values[field] = answers[oid]
+        else:
+            values.update(zip(spec.get("targets", ()), answers[oid]))
+    return values
+
+
+def update_master_features(master_layer, overlays, results, where_clause=None, excluded_internal_ids=()):
+    """Write the overlay results to the empty target fields of the selected features and return the rows written.
+
+    Fields that already have a value are kept. A field whose overlay found no match gets the
+    no_match_values entry for its type. Rows are only written back when a field changed.
+    """
+    target_fields = sorted({field for spec in overlays for field in spec.get("targets", ())})
+    field_types = {field.name: field.type for field in arcpy.ListFields(master_layer)}
+    written = 0
+    with arcpy.da.UpdateCursor(master_layer, ["OID@", "Internal_ID"] + target_fields, where_clause) as cursor:
+        for row in cursor:
+            if row[1] in excluded_internal_ids:
+                continue
+            values = enrichment_values(row[0], overlays, results)
+            updated = list(row)
+            for position, field in enumerate(target_fields, start=2):
+                if updated[position] is None and field in values:
+                    value = values[field]
+                    updated[position] = value if value is not None else no_match_values.get(field_types.get(field))
+            if updated != list(row):
+                cursor.updateRow(updated)
+                written += 1
+    return written
+
 
 def main():
     # URLs for the feature layers
@@ -31,116 +368,53 @@ def main():
     feis_rca_layer = arcpy.management.MakeFeatureLayer(feis_rca_layer_url, "feis_rca_layer")
     rca_inf_layer = arcpy.management.MakeFeatureLayer(rca_inf_layer_url, "rca_inf_layer")
 
-    # Local workspace for temporary data
-    arcpy.env.workspace = "in_memory"
-
-    temp_join_fc_whitebark = "temp_join_whitebark"
-    temp_join_fc_wilderness = "temp_join_wilderness"
-    temp_join_fc_government = "temp_join_government"
-    temp_join_fc_ranger = "temp_join_ranger"
-    temp_join_fc_sce_district = "temp_join_sce_district"
-    temp_join_fc_township = "temp_join_township"
-    temp_join_fc_section = "temp_join_section"
-    temp_join_fc_ferc = "temp_join_ferc"
-    temp_join_fc_feis_rca = "temp_join_fc_feis_rca"
-    temp_join_fc_rca_inf = "temp_join_fc_rca_inf"
-
-    for temp_fc in [temp_join_fc_whitebark, temp_join_fc_wilderness, temp_join_fc_government, temp_join_fc_ranger,
-                    temp_join_fc_sce_district, temp_join_fc_township, temp_join_fc_section, temp_join_fc_ferc,
-                    temp_join_fc_feis_rca, temp_join_fc_rca_inf]:
-        if arcpy.Exists(temp_fc):
-            arcpy.Delete_management(temp_fc)
-
-    # WBP JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, whitebark_pine_layer, temp_join_fc_whitebark, "KEEP_ALL", "WITHIN")
-    survey_required_dict = {}
-    with arcpy.da.SearchCursor(temp_join_fc_whitebark, ["TARGET_FID", "Join_Count"]) as cursor:
-        for row in cursor:
-            survey_required_dict[row[0]] = 'Yes' if row[1] > 0 else 'No'
+    # Overlays run against the master points: "flag" overlays give 'Yes'/'No' for any match,
+    # "attributes" overlays give the listed fields of the first matching boundary.
+    # "cache" marks the static reference layers kept in the local reference cache.
+    # "targets" are the master fields an overlay fills; it only runs for features where one is still null.
+    # A flag fills each of its targets, and when two flag overlays share a target either one's 'Yes' wins.
+    # "depends_on" overlays finish first; "append_to" adds this overlay's fields to another overlay's results.
+    overlays = [
+        {"name": "whitebark", "layer": whitebark_pine_layer, "predicate": "within", "kind": "flag",
+         "targets": ["Whitebark_Pine_Survey_Required"]},
+        {"name": "wilderness", "layer": wilderness_area_layer, "predicate": "within", "kind": "flag",
+         "cache": True, "source": wilderness_area_layer_url, "targets": ["Wilderness_Area"]},
+        {"name": "government", "layer": government_lands_layer, "predicate": "intersects", "kind": "attributes",
+         "fields": ["AGENCY_ARE"], "targets": ["Forest"]},
+        {"name": "ranger", "layer": ranger_district_layer, "predicate": "intersects", "kind": "attributes",
+         "fields": ["DISTRICTNAME"], "targets": ["Ranger_District"]},
+        {"name": "sce_district", "layer": sce_district_layer, "predicate": "intersects", "kind": "attributes",
+         "fields": ["DistrictNumber", "NAME"], "targets": ["SCE_District", "Geographic_Area"]},
+        {"name": "township", "layer": township_layer, "predicate": "intersects", "kind": "attributes",
+         "fields": ["TWNSHPLAB"], "cache": True, "source": township_layer_url, "targets": ["Township", "Section"]},
+        {"name": "section", "layer": section_layer, "predicate": "intersects", "kind": "attributes",
+         "fields": ["FRSTDIVNO"], "cache": True, "source": section_layer_url, "targets": ["Township", "Section"],
+         "depends_on": ["township"], "append_to": "township"},
+        {"name": "ferc", "layer": ferc_boundaries_layer, "predicate": "intersects", "kind": "flag",
+         "cache": True, "source": ferc_boundaries_layer_url, "targets": ["FERC_Notification_Required"]},
+        {"name": "feis_rca", "layer": feis_rca_layer, "predicate": "intersects", "kind": "flag",
+         "cache": True, "source": feis_rca_layer_url,
+         "targets": ["Waters_Wetlands_Work_Class", "Waters_Wetlands_Review1", "Waters_Wetlands_RPMs"]},
+        {"name": "rca_inf", "layer": rca_inf_layer, "predicate": "intersects", "kind": "flag",
+         "cache": True, "source": rca_inf_layer_url,
+         "targets": ["Waters_Wetlands_Work_Class", "Waters_Wetlands_Review1", "Waters_Wetlands_RPMs"]},
+    ]
 
-    # Wilderness JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, wilderness_area_layer, temp_join_fc_wilderness, "KEEP_ALL", "WITHIN")
-    wilderness_required_dict = {}
-    with arcpy.da.SearchCursor(temp_join_fc_wilderness, ["TARGET_FID", "Join_Count"]) as cursor:
-        for row in cursor:
-            wilderness_required_dict[row[0]] = 'Yes' if row[1] > 0 else 'No'
-
-    # Government JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, government_lands_layer, temp_join_fc_government, "KEEP_ALL", "INTERSECT")
-    forest_dict = {}
-    with arcpy.da.SearchCursor(temp_join_fc_government, ["TARGET_FID", "AGENCY_ARE"]) as cursor:
-        for row in cursor:
-            forest_dict[row[0]] = row[1]
-
-    # Ranger JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, ranger_district_layer, temp_join_fc_ranger, "KEEP_ALL", "INTERSECT")
-    ranger_dict = {}
-    with arcpy.da.SearchCursor(temp_join_fc_ranger, ["TARGET_FID", "DISTRICTNAME"]) as cursor:
-        for row in cursor:
-            ranger_dict[row[0]] = row[1]
-
-    # SCE District JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, sce_district_layer, temp_join_fc_sce_district, "KEEP_ALL", "INTERSECT")
-    sce_district_dict = {}
-    with arcpy.da.SearchCursor(temp_join_fc_sce_district, ["TARGET_FID", "DistrictNumber", "NAME"]) as cursor:
-        for row in cursor:
-            sce_district_dict[row[0]] = (row[1], row[2])
-
-    # Township JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, township_layer, temp_join_fc_township, "KEEP_ALL", "INTERSECT")
-    township_dict = {}
-    with arcpy.da.SearchCursor(temp_join_fc_township, ["TARGET_FID", "TWNSHPLAB"]) as cursor:
-        for row in cursor:
-            township_dict[row[0]] = (row[1],)
-
-    # Section JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, section_layer, temp_join_fc_section, "KEEP_ALL", "INTERSECT")
-    with arcpy.da.SearchCursor(temp_join_fc_section, ["TARGET_FID", "FRSTDIVNO"]) as cursor:
-        for row in cursor:
-            township_dict[row[0]] += (row[1],)
-
-    # FERC JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, ferc_boundaries_layer, temp_join_fc_ferc, "KEEP_ALL", "INTERSECT")
-    ferc_dict = {}
-    with arcpy.da.SearchCursor(temp_join_fc_ferc, ["TARGET_FID", "Join_Count"]) as cursor:
-        for row in cursor:
-            ferc_dict[row[0]] = 'Yes' if row[1] > 0 else 'No'
-
-    # FEIS JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, feis_rca_layer, temp_join_fc_feis_rca, "KEEP_ALL", "INTERSECT")
-    waters_feis_dict = {}
-    with arcpy.da.SearchCursor(temp_join_fc_feis_rca, ["TARGET_FID", "Join_Count"]) as cursor:
-        for row in cursor:
-            waters_feis_dict[row[0]] = 'Yes' if row[1] > 0 else 'No'
-
-    # INF JOIN
-    arcpy.analysis.SpatialJoin(master_feature_class_url_layer, rca_inf_layer, temp_join_fc_rca_inf, "KEEP_ALL", "INTERSECT")
-    waters_INF_dict = {}
-    with arcpy.da.SearchCursor(temp_join_fc_rca_inf, ["TARGET_FID", "Join_Count"]) as cursor:
-        for row in cursor:
-            waters_INF_dict[row[0]] = 'Yes' if row[1] > 0 else 'No'
-
-    # Update fields
+    # Features with these Internal_IDs are never updated
     excluded_internal_ids = ['XX056']
-    where_clause = ("Wilderness_Area IS NULL OR Whitebark_Pine_Survey_Required IS NULL OR Forest IS NULL OR Ranger_District IS NULL "
-                    "OR SCE_District IS NULL OR Geographic_Area IS NULL OR FERC_Notification_Required IS NULL "
-                    "OR Waters_Wetlands_Work_Class IS NULL OR Waters_Wetlands_Review1 IS NULL OR Waters_Wetlands_RPMs IS NULL")
-
-    with arcpy.da.UpdateCursor(master_feature_class_url_layer, ["OBJECTID", "Wilderness_Area", "Whitebark_Pine_Survey_Required",
-                                                                "Forest", "Ranger_District", "SCE_District", "Geographic_Area",
-                                                                "FERC_Notification_Required", "Waters_Wetlands_Work_Class",
-                                                                "Waters_Wetlands_Review1", "Waters_Wetlands_RPMs", "Internal_ID"],
-                               where_clause) as cursor:
-        for row in cursor:
-            # Update logic here...
-            cursor.updateRow(row)
 
-    # Clean up
-    for temp_fc in [temp_join_fc_whitebark, temp_join_fc_wilderness, temp_join_fc_government, temp_join_fc_ranger,
-                    temp_join_fc_sce_district, temp_join_fc_township, temp_join_fc_section, temp_join_fc_ferc,
-                    temp_join_fc_feis_rca, temp_join_fc_rca_inf]:
-        arcpy.Delete_management(temp_fc)
+    # Only features missing at least one attribute are enriched
+    where_clause = enrichment_where_clause(overlays, excluded_internal_ids)
+
+    # Answer the needed overlays from a local spatial index when shapely is installed, otherwise with SpatialJoin
+    if shapely is not None:
+        results = run_overlays_with_index(master_feature_class_url_layer, overlays, where_clause)
+    else:
+        results = run_overlays_with_spatial_join(master_feature_class_url_layer, overlays, where_clause)
 
+    written = update_master_features(master_feature_class_url_layer, overlays, results, where_clause,
+                                     excluded_internal_ids)
+    print(f"Updated {written} feature(s).")
     print("Update completed successfully.")
 
 if __name__ == "__main__":
@@ -0,0 +1,32 @@
+"""Load the Companion script for testing with a stand-in arcpy module."""
+import importlib.util
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+PROJECT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_PATH = os.path.join(PROJECT_FOLDER, "Master_Feature_Service_Updater_Companion.py")
+UPDATER_PATH = os.path.join(PROJECT_FOLDER, "Master_Feature_Service_Updater.py")
+
+
+@pytest.fixture(scope="session")
+def companion():
+    """Return the imported Companion module."""
+    with mock.patch.dict(sys.modules, {"arcpy": mock.MagicMock(name="arcpy")}):
+        spec = importlib.util.spec_from_file_location("master_updater_companion", SCRIPT_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def master_updater():
+    """Return the imported Master Feature Service Updater, with its sibling points updater stubbed."""
+    stubs = {"arcpy": mock.MagicMock(name="arcpy"), "Master_MSUP_Points_Updater": mock.MagicMock()}
+    with mock.patch.dict(sys.modules, stubs):
+        spec = importlib.util.spec_from_file_location("master_feature_service_updater", UPDATER_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
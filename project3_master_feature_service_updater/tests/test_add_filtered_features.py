@@ -0,0 +1,97 @@
+"""Adding filtered source features to the master through a local stand-in for its applyEdits endpoint."""
+import contextlib
+import http.server
+import json
+import threading
+import urllib.parse
+from types import SimpleNamespace
+
+import pytest
+
+SOURCE = {
+    "name": "HazTree",
+    "path": "haz_tree_layer",
+    "check_fields": ["environmental_hold_reason"],
+    "field_mapping": {"control_number": "Control_Number_RLC_OID_Structur", "district_number": "District"},
+}
+POINT = json.dumps({"x": 1.5, "y": 2.5, "spatialReference": {"wkid": 3857}})
+
+
+class MasterLayerHandler(http.server.BaseHTTPRequestHandler):
+    """Answers the layer info and applyEdits requests and records the features added."""
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        form = {key: values[0] for key, values in urllib.parse.parse_qs(self.rfile.read(length).decode()).items()}
+        if self.path.endswith('/applyEdits'):
+            adds = json.loads(form.get('adds', '[]'))
+            self.server.batches.append(adds)
+            result = {'addResults': [{'objectId': i, 'success': True} for i, _ in enumerate(adds)], 'updateResults': []}
+        else:
+            result = {'objectIdField': 'OBJECTID', 'fields': [{'name': 'OBJECTID', 'type': 'esriFieldTypeOID'}]}
+        body = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def master_layer():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), MasterLayerHandler)
+    server.batches = []
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/FeatureServer/0'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def source_rows(master_updater, monkeypatch):
+    rows = [
+        ("CN-1", 39, POINT),            # added
+        ("CN-2", 22, POINT),            # district not assigned to ERM
+        ("CN-3", "VENTURA", POINT),     # district name of a valid district
+        ("CN-EXISTING", 39, POINT),     # already in the master
+        ("CN-1", 39, POINT),            # duplicate within the source
+        ("CN-4", 49.0, None),           # no geometry
+    ]
+    arcpy = SimpleNamespace(da=SimpleNamespace(
+        SearchCursor=lambda path, fields, spatial_reference=None: contextlib.nullcontext(iter(rows))))
+    monkeypatch.setattr(master_updater, "arcpy", arcpy)
+    monkeypatch.setattr(master_updater, "unique_ids", {"CN-EXISTING"})
+    monkeypatch.setattr(master_updater, "source_control_numbers", set())
+    return rows
+
+
+def test_is_valid_district(master_updater):
+    assert master_updater.is_valid_district(39)
+    assert master_updater.is_valid_district("39")
+    assert master_updater.is_valid_district(85.0)
+    assert master_updater.is_valid_district("bishop/mammoth")
+    assert not master_updater.is_valid_district(22)
+    assert not master_updater.is_valid_district(None)
+
+
+def test_filtered_features_are_sent_in_applyedits_batches(master_updater, master_layer, source_rows):
+    writer = master_updater.ApplyEditsWriter(master_layer.url, batch_size=2, max_workers=1)
+
+    added = master_updater.add_filtered_features(SOURCE, writer)
+    results = writer.close()
+
+    assert added == 3 and results['added'] == 3
+    assert [len(batch) for batch in master_layer.batches] == [2, 1]
+    features = [feature for batch in master_layer.batches for feature in batch]
+    assert [feature['attributes'] for feature in features] == [
+        {"Control_Number_RLC_OID_Structur": "CN-1", "District": 39, "Source_Feature_Class": "HazTree"},
+        {"Control_Number_RLC_OID_Structur": "CN-3", "District": "VENTURA", "Source_Feature_Class": "HazTree"},
+        {"Control_Number_RLC_OID_Structur": "CN-4", "District": 49.0, "Source_Feature_Class": "HazTree"},
+    ]
+    assert features[0]['geometry'] == json.loads(POINT)
+    assert 'geometry' not in features[2]
@@ -0,0 +1,115 @@
+"""Overlay answers from the STRtree index and the overlay scheduler."""
+import contextlib
+import threading
+from unittest import mock
+
+import pytest
+import shapely
+
+SQUARE = shapely.box(0, 0, 10, 10)
+OVERLAPPING = shapely.box(5, 0, 15, 10)
+
+
+def test_within_excludes_points_on_the_boundary_and_intersects_includes_them(companion):
+    point_ids = [1, 2, 3]
+    points = shapely.points([(5, 5), (10, 5), (20, 20)])
+
+    within = companion.overlay(point_ids, points, [SQUARE], [()], "within", "flag")
+    intersects = companion.overlay(point_ids, points, [SQUARE], [()], "intersects", "flag")
+
+    assert within == {1: 'Yes', 2: 'No', 3: 'No'}
+    assert intersects == {1: 'Yes', 2: 'Yes', 3: 'No'}
+
+
+def test_attributes_come_from_the_first_matching_boundary(companion):
+    point_ids = [10, 11, 12]
+    points = shapely.points([(7, 5), (12, 5), (2, 5)])
+    # Listed overlapping-first, so the point inside both takes the overlapping polygon's attributes.
+    boundaries = [OVERLAPPING, SQUARE]
+    rows = [("east", 2), ("west", 1)]
+
+    result = companion.overlay(point_ids, points, boundaries, rows, "intersects", "attributes", 2)
+
+    assert result == {10: ("east", 2), 11: ("east", 2), 12: ("west", 1)}
+
+
+def test_points_without_a_match_get_empty_attributes(companion):
+    points = shapely.points([(50, 50), (5, 5)])
+
+    result = companion.overlay([1, 2], points, [SQUARE], [("a", "b", "c")], "within", "attributes", 3)
+
+    assert result == {1: (None, None, None), 2: ("a", "b", "c")}
+
+
+def test_empty_boundary_layer_matches_nothing(companion):
+    points = shapely.points([(5, 5)])
+
+    assert companion.overlay([1], points, [], [], "within", "attributes", 2) == {1: (None, None)}
+    assert companion.overlay([1], points, [], [], "within", "flag") == {1: 'No'}
+
+
+def test_scheduler_runs_dependencies_first_and_appends_results(companion):
+    order = []
+    answers = {"section": {1: ("S1",), 2: ("S2",)}, "township": {1: ("T1", "R1"), 2: ("T2", "R2")},
+               "pine": {1: 'Yes', 2: 'No'}}
+
+    def run_overlay(spec):
+        order.append(spec["name"])
+        return dict(answers[spec["name"]])
+
+    overlays = [
+        {"name": "township", "depends_on": ["section"], "append_to": "section"},
+        {"name": "section"},
+        {"name": "pine"},
+    ]
+    results = companion.run_overlay_scheduler(overlays, run_overlay, max_workers=2)
+
+    assert order.index("section") < order.index("township")
+    assert results["section"] == {1: ("S1", "T1", "R1"), 2: ("S2", "T2", "R2")}
+    assert results["pine"] == {1: 'Yes', 2: 'No'}
+
+
+@pytest.mark.parametrize("overlays", [
+    [{"name": "a", "depends_on": ["b"]}, {"name": "b", "depends_on": ["a"]}],
+    [{"name": "a", "depends_on": ["missing"]}],
+])
+def test_scheduler_rejects_dependencies_that_cannot_be_met(companion, overlays):
+    with pytest.raises(ValueError, match="cannot be met"):
+        companion.run_overlay_scheduler(overlays, lambda spec: {}, max_workers=2)
+
+
+class RecordingArcpy:
+    """Serves the master points and boundary layers through SearchCursor and records the calling threads."""
+
+    def __init__(self, master_rows, layers):
+        self.master_rows = master_rows
+        self.layers = layers
+        self.cursor_threads = []
+        self.da = self
+
+    def Describe(self, layer):
+        return mock.Mock(spatialReference=None)
+
+    def SearchCursor(self, layer, fields, where_clause=None, spatial_reference=None):
+        self.cursor_threads.append(threading.current_thread())
+        rows = self.master_rows if layer == "master" else self.layers[layer]
+        return contextlib.nullcontext(list(rows))
+
+
+def test_boundary_layers_are_read_on_the_calling_thread(companion, monkeypatch):
+    point = shapely.to_wkb(shapely.Point(5, 5))
+    fake_arcpy = RecordingArcpy(
+        master_rows=[(1, point, None, None), (2, shapely.to_wkb(shapely.Point(50, 50)), None, None)],
+        layers={"pine_layer": [(shapely.to_wkb(SQUARE),)], "zone_layer": [(shapely.to_wkb(SQUARE), "Z1")]},
+    )
+    monkeypatch.setattr(companion, "arcpy", fake_arcpy)
+    overlays = [
+        {"name": "pine", "layer": "pine_layer", "predicate": "within", "kind": "flag", "targets": ["Pine"]},
+        {"name": "zone", "layer": "zone_layer", "predicate": "within", "kind": "attributes",
+         "fields": ["Zone"], "targets": ["Zone"]},
+    ]
+
+    results = companion.run_overlays_with_index("master", overlays)
+
+    assert results == {"pine": {1: 'Yes', 2: 'No'}, "zone": {1: ("Z1",), 2: (None,)}}
+    assert fake_arcpy.cursor_threads == [threading.current_thread()] * 3
@@ -0,0 +1,89 @@
+"""Change detection for the cached static reference layers."""
+from unittest import mock
+
+import pytest
+
+
+def make_gdb(tmp_path):
+    gdb = tmp_path / "Reference.gdb"
+    gdb.mkdir()
+    (gdb / "a00000009.gdbtable").write_bytes(b"table")
+    (gdb / "a00000009.gdbtablx").write_bytes(b"index")
+    return str(gdb / "Boundaries")
+
+
+def test_gdb_version_ignores_lock_files(companion, tmp_path):
+    source = make_gdb(tmp_path)
+    before = companion.get_layer_version(source)
+
+    (tmp_path / "Reference.gdb" / "_gdb.HOST.1234.5678.sr.lock").write_bytes(b"")
+    (tmp_path / "Reference.gdb" / "a00000009.HOST.1234.5678.sr.lock").write_bytes(b"")
+
+    assert companion.get_layer_version(source) == before
+
+
+def test_gdb_version_changes_with_the_data(companion, tmp_path):
+    source = make_gdb(tmp_path)
+    before = companion.get_layer_version(source)
+
+    (tmp_path / "Reference.gdb" / "a00000009.gdbtable").write_bytes(b"edited table")
+
+    assert companion.get_layer_version(source) != before
+
+
+@pytest.fixture(autouse=True)
+def signed_in(companion, monkeypatch):
+    """Sign the stand-in arcpy in to a portal so service requests carry a token."""
+    monkeypatch.setattr(companion.arcpy, "GetSigninToken",
+                        mock.Mock(return_value={"token": "abc123", "referer": "https://portal.example.com"}))
+
+
+def service_responses(companion, *payloads):
+    """Patch requests.get to return the payloads as JSON bodies, in order."""
+    responses = [mock.Mock(json=mock.Mock(return_value=payload)) for payload in payloads]
+    return mock.patch.object(companion.requests, "get", side_effect=responses)
+
+
+@pytest.mark.parametrize("payloads", [
+    [{"error": {"code": 499, "message": "Token Required"}}],
+    [{"name": "Boundaries"}, {"error": {"code": 400, "message": "Unable to complete operation."}}],
+])
+def test_service_errors_are_raised(companion, payloads):
+    with service_responses(companion, *payloads):
+        with pytest.raises(RuntimeError):
+            companion.get_layer_version("https://example.com/FeatureServer/0")
+
+
+def test_service_version_uses_last_edit_date(companion):
+    with service_responses(companion, {"editingInfo": {"lastEditDate": 1700000000000}}):
+        assert companion.get_layer_version("https://example.com/FeatureServer/0") == "lastEditDate:1700000000000"
+
+
+def test_service_requests_carry_the_arcpy_signin_token(companion):
+    with service_responses(companion, {"name": "Boundaries"}, {"count": 3}) as get:
+        companion.get_layer_version("https://example.com/FeatureServer/0")
+
+    for call in get.call_args_list:
+        assert call.kwargs["params"]["token"] == "abc123"
+        assert call.kwargs["headers"] == {"Referer": "https://portal.example.com"}
+
+
+def test_no_token_when_arcpy_is_not_signed_in(companion):
+    companion.arcpy.GetSigninToken.return_value = None
+    with service_responses(companion, {"editingInfo": {"lastEditDate": 1}}) as get:
+        companion.get_layer_version("https://example.com/FeatureServer/0")
+
+    assert "token" not in get.call_args.kwargs["params"]
+
+
+def test_unknown_version_without_a_cache_reads_the_layer_directly(companion, monkeypatch, tmp_path):
+    monkeypatch.setattr(companion, "reference_cache_folder", str(tmp_path))
+    monkeypatch.setattr(companion, "get_layer_version", mock.Mock(side_effect=RuntimeError("Token Required")))
+    load_geometries = mock.Mock(return_value=(["geometry"], [("row",)]))
+    monkeypatch.setattr(companion, "load_geometries", load_geometries)
+
+    result = companion.load_cached_geometries("wilderness", "https://example.com/FeatureServer/0", "layer", ["NAME"])
+
+    assert result == (["geometry"], [("row",)])
+    load_geometries.assert_called_once_with("layer", ["NAME"], None)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,94 @@
+"""Writing the overlay results back to the empty fields of the master features."""
+import contextlib
+from types import SimpleNamespace
+
+OVERLAYS = [
+    {"name": "pine", "kind": "flag", "targets": ["Pine"]},
+    {"name": "forest", "kind": "attributes", "fields": ["NAME"], "targets": ["Forest"]},
+    {"name": "district", "kind": "attributes", "fields": ["NUMBER"], "targets": ["District"]},
+    {"name": "feis", "kind": "flag", "targets": ["Waters"]},
+    {"name": "inf", "kind": "flag", "targets": ["Waters"]},
+    {"name": "township", "kind": "attributes", "fields": ["TWNSHPLAB"], "targets": ["Township", "Section"]},
+    {"name": "section", "kind": "attributes", "fields": ["FRSTDIVNO"], "targets": ["Township", "Section"],
+     "depends_on": ["township"], "append_to": "township"},
+]
+
+
+class FakeMaster:
+    """Serves master rows through arcpy.da.UpdateCursor and records the rows written back."""
+
+    def __init__(self, rows, field_types):
+        self.rows = rows
+        self.field_types = field_types
+        self.written = []
+        self.da = self
+
+    def ListFields(self, layer):
+        return [SimpleNamespace(name=name, type=field_type) for name, field_type in self.field_types.items()]
+
+    def UpdateCursor(self, layer, fields, where_clause=None):
+        self.fields = fields
+        return contextlib.nullcontext(FakeCursor(self))
+
+
+class FakeCursor:
+    def __init__(self, master):
+        self.master = master
+
+    def __iter__(self):
+        return iter([list(row) for row in self.master.rows])
+
+    def updateRow(self, row):
+        self.master.written.append(row)
+
+
+def field_types(**overrides):
+    types = {"Pine": "String", "Forest": "String", "District": "Integer", "Waters": "String",
+             "Section": "String", "Township": "String"}
+    return {**types, **overrides}
+
+
+def test_values_fill_only_the_empty_fields(companion, monkeypatch):
+    # Cursor fields: OID@, Internal_ID, then the targets in sorted order
+    master = FakeMaster([(1, "A1", None, "Kept", None, None, None, None)], field_types())
+    monkeypatch.setattr(companion, "arcpy", master)
+    results = {"pine": {1: 'Yes'}, "forest": {1: ("Sierra",)}, "district": {1: (42,)}, "feis": {1: 'No'},
+               "inf": {1: 'Yes'}, "township": {1: ("T1N R2W", "12")}, "section": {}}
+
+    written = companion.update_master_features("master", OVERLAYS, results)
+
+    assert master.fields == ["OID@", "Internal_ID", "District", "Forest", "Pine", "Section", "Township", "Waters"]
+    assert written == 1
+    assert master.written == [[1, "A1", 42, "Kept", 'Yes', "12", "T1N R2W", 'Yes']]
+
+
+def test_features_without_a_match_are_marked_so_they_are_not_selected_again(companion, monkeypatch):
+    # A no-match answer for a field type without a no_match_values entry leaves the field empty
+    master = FakeMaster([(1, "A1", None, None, 'No', None, "T1N", 'No')], field_types(Section="Date"))
+    monkeypatch.setattr(companion, "arcpy", master)
+    results = {"forest": {1: (None,)}, "district": {1: (None,)}, "township": {1: (None, None)}}
+
+    companion.update_master_features("master", OVERLAYS, results)
+
+    assert master.written == [[1, "A1", -1, "Not Found", 'No', None, "T1N", 'No']]
+
+
+def test_unchanged_and_excluded_rows_are_not_written(companion, monkeypatch):
+    master = FakeMaster([(1, "A1", None, "Sierra", 'Yes', "12", "T1N", 'No'),
+                         (2, "XX056", None, None, None, None, None, None)], field_types())
+    monkeypatch.setattr(companion, "arcpy", master)
+    # Feature 1's empty District had no overlay answer, so there is nothing to write
+    results = {"pine": {1: 'No', 2: 'Yes'}, "forest": {2: ("Inyo",)}}
+
+    written = companion.update_master_features("master", OVERLAYS, results, excluded_internal_ids=["XX056"])
+
+    assert written == 0
+    assert master.written == []
+
+
+def test_where_clause_selects_empty_targets_and_leaves_out_excluded_ids(companion):
+    where_clause = companion.enrichment_where_clause(OVERLAYS[:2], ["XX056", "O'Neil"])
+
+    assert where_clause == ("(Forest IS NULL OR Pine IS NULL) AND "
+                            "(Internal_ID IS NULL OR Internal_ID NOT IN ('XX056', 'O''Neil'))")
+    assert companion.enrichment_where_clause(OVERLAYS[:1]) == "Pine IS NULL"
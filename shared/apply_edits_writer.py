@@ -0,0 +1,192 @@
+"""Batched REST writer for hosted feature layers, shared by the project scripts.
+
+Edits are queued and sent to the layer's applyEdits endpoint in batches of batch_size, with at
+most max_workers batches in flight. It only needs requests, so it can be used where arcpy is
+not installed. A script adds this folder to sys.path and imports ApplyEditsWriter from it.
+"""
+import concurrent.futures
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+# REST field types whose values are sent and returned as epoch milliseconds.
+date_field_types = {'esriFieldTypeDate', 'esriFieldTypeDateOnly', 'esriFieldTypeTimestampOffset'}
+
+# Formats tried, in order, when a date field is given a string.
+default_date_formats = ["%m/%d/%y %I:%M %p", "%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"]
+
+epoch = datetime(1970, 1, 1)
+
+
+class ApplyEditsWriter:
+    """Queue adds and updates for a feature layer and send them through applyEdits in batches."""
+
+    def __init__(self, layer_url, token=None, batch_size=250, max_workers=4, max_retries=3, session=None,
+                 date_formats=None):
+        self.layer_url = layer_url.rstrip('/')
+        self.token = token
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.date_formats = date_formats or default_date_formats
+        self.session = session or requests.Session()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.in_flight = threading.BoundedSemaphore(max_workers * 2)
+        self.futures = []
+        self.pending_adds = []
+        self.pending_updates = []
+        self.objectid_field = None
+        self.field_types = {}
+        self.results = {'requests': 0, 'batches': 0, 'added': 0, 'updated': 0, 'failed_batches': 0}
+        self.results_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _post(self, endpoint, data):
+        """POST to the layer (or one of its endpoints) and return the JSON response, raising on errors."""
+        if self.token:
+            data = dict(data, token=self.token)
+        url = f"{self.layer_url}/{endpoint}" if endpoint else self.layer_url
+        response = self.session.post(url, data=dict(data, f='json'), timeout=120)
+        with self.results_lock:
+            self.results['requests'] += 1
+        response.raise_for_status()
+        result = response.json()
+        if 'error' in result:
+            raise RuntimeError(f"{endpoint or 'layer info'} failed: {result['error']}")
+        return result
+
+    def describe(self):
+        """Read the layer's object ID field and field types once, before any query or edit."""
+        if self.objectid_field is None:
+            info = self._post('', {})
+            self.field_types = {field['name']: field['type'] for field in info.get('fields', [])}
+            self.objectid_field = info.get('objectIdField') or next(
+                (name for name, field_type in self.field_types.items() if field_type == 'esriFieldTypeOID'),
+                'OBJECTID')
+        return self.field_types
+
+    def query_rows(self, where_clause, fields, page_size=2000):
+        """Yield (objectid, [field values]) for features matching the where clause, paging through results.
+
+        Pages are ordered by object ID so resultOffset steps through a stable sequence.
+        """
+        self.describe()
+        offset = 0
+        while True:
+            result = self._post('query', {
+                'where': where_clause, 'outFields': ','.join(fields), 'returnGeometry': 'false',
+                'orderByFields': self.objectid_field, 'resultOffset': offset, 'resultRecordCount': page_size
+            })
+            features = result.get('features', [])
+            for feature in features:
+                attributes = feature['attributes']
+                yield attributes.get(self.objectid_field), [self._decode_value(field, attributes.get(field))
+                                                            for field in fields]
+            if not result.get('exceededTransferLimit') or not features:
+                return
+            offset += len(features)
+
+    def _decode_value(self, field, value):
+        """Return date field values, which the REST API sends as epoch milliseconds, as datetimes."""
+        if self.field_types.get(field) in date_field_types and isinstance(value, (int, float)):
+            return epoch + timedelta(milliseconds=value)
+        return value
+
+    def _parse_date(self, value):
+        """Return a date string as a datetime, None for a blank, or the string if no format matches."""
+        value = value.strip()
+        if value in ['', 'None']:
+            return None
+        for date_format in self.date_formats:
+            try:
+                return datetime.strptime(value, date_format)
+            except ValueError:
+                continue
+        return value
+
+    def _encode_dates(self, attributes):
+        """Return the attributes with date field values converted to epoch milliseconds."""
+        encoded = dict(attributes)
+        for field, value in attributes.items():
+            if self.field_types.get(field) not in date_field_types:
+                continue
+            if isinstance(value, str):
+                value = self._parse_date(value)
+            if isinstance(value, datetime):
+                value = (value.replace(tzinfo=None) - epoch) // timedelta(milliseconds=1)
+            encoded[field] = value
+        return encoded
+
+    def add(self, attributes, geometry=None):
+        """Queue a new feature; geometry is an Esri JSON geometry dict."""
+        self.describe()
+        feature = {'attributes': self._encode_dates(attributes)}
+        if geometry is not None:
+            feature['geometry'] = geometry
+        self.pending_adds.append(feature)
+        self._flush_if_full()
+
+    def update(self, attributes):
+        """Queue an update; attributes must include the layer's object ID field."""
+        self.describe()
+        self.pending_updates.append({'attributes': self._encode_dates(attributes)})
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if len(self.pending_adds) + len(self.pending_updates) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Send the queued edits as one batch, waiting if too many batches are already in flight."""
+        if not self.pending_adds and not self.pending_updates:
+            return
+        adds, updates = self.pending_adds, self.pending_updates
+        self.pending_adds, self.pending_updates = [], []
+        self.in_flight.acquire()
+        future = self.executor.submit(self._send_batch, adds, updates)
+        future.add_done_callback(lambda _: self.in_flight.release())
+        self.futures.append(future)
+
+    def _send_batch(self, adds, updates):
+        """Send one applyEdits batch, retrying the whole batch with backoff on failure."""
+        data = {'rollbackOnFailure': 'true'}
+        if adds:
+            data['adds'] = json.dumps(adds)
+        if updates:
+            data['updates'] = json.dumps(updates)
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                result = self._post('applyEdits', data)
+                failed = [r for r in result.get('addResults', []) + result.get('updateResults', [])
+                          if not r.get('success')]
+                if failed:
+                    raise RuntimeError(f"applyEdits rejected {len(failed)} edit(s): {failed[0].get('error')}")
+                with self.results_lock:
+                    self.results['batches'] += 1
+                    self.results['added'] += len(adds)
+                    self.results['updated'] += len(updates)
+                return
+            except Exception as exc:
+                if attempt == self.max_retries:
+                    with self.results_lock:
+                        self.results['failed_batches'] += 1
+                    print(f"applyEdits batch of {len(adds) + len(updates)} edit(s) failed: {exc}")
+                    raise
+                time.sleep(2 ** attempt)
+
+    def close(self):
+        """Send any remaining edits, wait for every batch and return the edit counts."""
+        self.flush()
+        concurrent.futures.wait(self.futures)
+        self.executor.shutdown()
+        print(f"applyEdits: {self.results['added']} added, {self.results['updated']} updated in "
+              f"{self.results['batches']} batch(es); {self.results['failed_batches']} batch(es) failed.")
+        return self.results